@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class BotConfig(AppConfig):
+    name = 'bot'
+
+    def ready(self):
+        # Register signal handlers
+        from . import signals
@@ -1,11 +1,18 @@
+import asyncio
+import itertools
 import logging
+import re
+import socket
 import threading
+import time
 import sys
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from django.utils import timezone
+from django.db import close_old_connections, connection, transaction
 from django.db.models import Count
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
+from telegram.error import BadRequest
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -16,11 +23,17 @@ from telegram.ext import (
     ContextTypes,
 )
 from asgiref.sync import sync_to_async
-from bot.models import Voter, Admin, Election, Candidate, Vote, Report, VerificationSession
-from bot.services.face_recognition import FaceRecognizer
+from channels.layers import get_channel_layer
+from bot.models import Voter, Admin, Election, Candidate, Ballot, Vote, Report, VerificationSession
 import os
 import uuid
 
+# uvloop is optional (it ships with uvicorn[standard], but not on Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 logger = logging.getLogger(__name__)
 
 # Define states for ConversationHandler
@@ -36,7 +49,6 @@ logger = logging.getLogger(__name__)
     VOTER_VOTE,
     VOTER_REPORT,
     ADD_VOTER,
-    WAITING_FACE_CAPTURE,
     VIEW_CANDIDATES,
     VIEW_REPORTS,
     SELECT_ELECTION_FOR_CANDIDATE,
@@ -44,15 +56,57 @@ logger = logging.getLogger(__name__)
     SELECT_POSITION,
     VOTING_BY_POSITION,
     VIEW_RESULTS,
-) = range(19)
+) = range(18)
+
+# Verification links are valid for 10 minutes (see VerificationSession.save)
+SESSION_TIMEOUT = 600
+# How often to check the database in case a result was not pushed to us
+SESSION_POLL_INTERVAL = 5
+# Seconds to reuse the list of active elections before querying again
+ACTIVE_ELECTIONS_TTL = 30
+# Seconds a cached admin or voter ID is trusted before the database is asked
+# again, so removals made elsewhere (e.g. the Django admin) take effect
+ADMIN_IDS_TTL = 30
+VOTER_IDS_TTL = 300
+
+# Splits "Title, start, end" admin input, trimming spaces around the commas
+FIELD_SEPARATOR_RE = re.compile(r'\s*,\s*')
+
+# Static replies, built once instead of on every request
+ADMIN_MENU_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Create Election", callback_data='create_election')],
+    [InlineKeyboardButton("Add Candidate", callback_data='add_candidate')],
+    [InlineKeyboardButton("View Candidates", callback_data='view_candidates')],
+    [InlineKeyboardButton("View Results", callback_data='view_results')],
+    [InlineKeyboardButton("View Reports", callback_data='view_reports')],
+    [InlineKeyboardButton("Add Admin", callback_data='add_admin')],
+    [InlineKeyboardButton("Remove Admin", callback_data='remove_admin')],
+    [InlineKeyboardButton("Add Voter", callback_data='add_voter')],
+])
+
+COMMANDS_TEXT = (
+    "/vote - Cast your vote\n"
+    "/help - View commands\n"
+    "/view_candidate - View candidates\n"
+    "/results - View election results\n"
+    "/report - Report an issue\n"
+    "/admin - Admin functions"
+)
+HELP_TEXT = f"Available Commands:\n{COMMANDS_TEXT}"
 
 class Command(BaseCommand):
     help = 'Run the Telegram bot for e-voting'
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.face_recognizer = None
         self.application = None
+        # Verification sessions started by this process, keyed by session ID.
+        # Results pushed by the verification view over the channel layer land
+        # here, so checking a session is a dict lookup instead of a query.
+        self.sessions = {}
+        self.channel_layer = None
+        self.channel_name = None
+        self.listener_task = None
     
     def add_arguments(self, parser):
         parser.add_argument(
@@ -69,15 +123,6 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR('TELEGRAM_BOT_TOKEN not configured in settings'))
             return
         
-        # Initialize face recognizer
-        try:
-            self.face_recognizer = FaceRecognizer()
-            self.stdout.write(self.style.SUCCESS('Face recognizer initialized'))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Failed to initialize face recognizer: {e}'))
-            self.stdout.write(self.style.WARNING('Bot will continue without face recognition'))
-            self.face_recognizer = None
-        
         # Run the bot using the simple synchronous approach
         try:
             self.run_bot_simple()
@@ -89,15 +134,20 @@ class Command(BaseCommand):
     def run_bot_simple(self):
         """Run the bot using the simple synchronous approach"""
         try:
-            # Test connectivity
+            # Test connectivity; opening a TCP connection is enough to know
+            # the API is reachable without a full HTTPS round trip
             self.stdout.write("Testing connectivity...")
-            import requests
-            response = requests.get("https://api.telegram.org", timeout=10)
+            socket.create_connection(("api.telegram.org", 443), timeout=10).close()
             self.stdout.write(self.style.SUCCESS("✅ Internet connection OK"))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"❌ Internet connection issue: {e}"))
             return
         
+        # run_polling creates its loop from the policy, so this makes it a uvloop
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            self.stdout.write("Using uvloop event loop")
+        
         # Create the Application
         self.application = (
             Application.builder()
@@ -106,6 +156,8 @@ class Command(BaseCommand):
             .read_timeout(30)
             .write_timeout(30)
             .pool_timeout(30)
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
             .build()
         )
         
@@ -114,18 +166,19 @@ class Command(BaseCommand):
             entry_points=[
                 CommandHandler('start', self.start),
                 CommandHandler('help', self.help_command),
-                CommandHandler('admin', self.admin),
-                CommandHandler('vote', self.vote),
+                CommandHandler('admin', self.admin, block=False),
+                CommandHandler('vote', self.vote, block=False),
                 CommandHandler('voters', self.voters),
                 CommandHandler('report', self.report),
                 CommandHandler('view_candidate', self.view_candidate),
                 CommandHandler('results', self.results),
             ],
             states={
-                WAITING_FACE_CAPTURE: [
-                    CommandHandler('check_admin', self.check_admin),
-                    CommandHandler('check_vote', self.check_vote),
-                    CommandHandler('check_voter_registration', self.check_voter_registration),
+                ConversationHandler.WAITING: [
+                    CommandHandler('cancel', self.cancel_verification),
+                    MessageHandler(filters.ALL, self.verification_in_progress),
+                    # Answer stale button taps so the client stops showing a spinner
+                    CallbackQueryHandler(self.verification_in_progress),
                 ],
                 ADMIN_ACTION: [
                     CallbackQueryHandler(self.admin_action),
@@ -164,9 +217,17 @@ class Command(BaseCommand):
         self.application.add_handler(conv_handler)
         self.application.add_error_handler(self.error_handler)
         
-        # Start cleanup thread
-        cleanup_thread = threading.Thread(target=self.cleanup_expired_sessions, daemon=True)
-        cleanup_thread.start()
+        # Voter and admin IDs are checked on every vote/admin request; keep them
+        # in memory as {id: time cached}
+        now = time.monotonic()
+        self.application.bot_data['voter_ids'] = dict.fromkeys(Voter.objects.values_list('matric_number', flat=True), now)
+        self.application.bot_data['admin_ids'] = dict.fromkeys(Admin.objects.values_list('telegram_id', flat=True), now)
+        
+        # Expire stale verification sessions every minute
+        if self.application.job_queue:
+            self.application.job_queue.run_repeating(self.cleanup_expired_sessions, interval=60, first=60)
+        else:
+            logger.warning("JobQueue not available; expired verification sessions will not be cleaned up")
         
         # Start election status update thread
         status_update_thread = threading.Thread(target=self.update_election_statuses_periodically, daemon=True)
@@ -176,7 +237,9 @@ class Command(BaseCommand):
         
         # Start the Bot with polling
         self.application.run_polling(
-            allowed_updates=Update.ALL_TYPES,
+            # Only messages and button presses are handled; don't have
+            # Telegram send (and us filter out) any other update types
+            allowed_updates=[Update.MESSAGE, Update.CALLBACK_QUERY],
             drop_pending_updates=True,
             timeout=30,
             bootstrap_retries=3,
@@ -186,23 +249,113 @@ class Command(BaseCommand):
             pool_timeout=30
         )
     
+    async def post_init(self, application):
+        """Subscribe to verification results pushed over the channel layer"""
+        self.channel_layer = get_channel_layer()
+        if self.channel_layer is None:
+            return
+        self.channel_name = await self.channel_layer.new_channel()
+        self.listener_task = asyncio.create_task(self.listen_for_verification_results())
+    
+    async def post_shutdown(self, application):
+        """Stop the result listener and drop any remaining session subscriptions"""
+        if self.listener_task:
+            self.listener_task.cancel()
+            try:
+                await self.listener_task
+            except asyncio.CancelledError:
+                pass
+            self.listener_task = None
+        
+        for session_id in list(self.sessions):
+            await self.discard_session(session_id)
+        
+        await sync_to_async(close_old_connections)()
+    
+    async def listen_for_verification_results(self):
+        """Wake up anyone waiting on a session when its group is notified.
+
+        Messages are only a hint: the result is always read back from the
+        database, so a forged group message can't complete a session.
+        """
+        while True:
+            try:
+                message = await self.channel_layer.receive(self.channel_name)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error receiving verification result: {e}")
+                await asyncio.sleep(1)
+                continue
+            
+            session = self.sessions.get(message.get('session_id'))
+            if session:
+                session['event'].set()
+    
+    async def register_session(self, session_id):
+        """Track a new verification session and join its notification group"""
+        self.sessions[session_id] = {'event': asyncio.Event(), 'created_at': timezone.now()}
+        if self.channel_name:
+            try:
+                await self.channel_layer.group_add(f'verification_{session_id}', self.channel_name)
+            except Exception as e:
+                logger.warning(f"Could not subscribe to session {session_id}: {e}")
+    
+    async def discard_session(self, session_id):
+        """Stop tracking a verification session once it has been handled"""
+        if self.sessions.pop(session_id, None) is not None and self.channel_name:
+            try:
+                await self.channel_layer.group_discard(f'verification_{session_id}', self.channel_name)
+            except Exception as e:
+                logger.warning(f"Could not unsubscribe from session {session_id}: {e}")
+    
+    async def wait_for_session(self, session_id, timeout=SESSION_TIMEOUT):
+        """Wait until the verification page reports a result for the session"""
+        session = self.sessions[session_id]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        
+        while loop.time() < deadline:
+            try:
+                await asyncio.wait_for(
+                    session['event'].wait(),
+                    timeout=min(SESSION_POLL_INTERVAL, deadline - loop.time())
+                )
+            except asyncio.TimeoutError:
+                pass
+            if session.get('cancelled'):
+                return None
+            session['event'].clear()
+            
+            # A notification only says to look now; results only arrive over
+            # the channel layer when it is shared with the web server, so the
+            # database is checked on every wake-up and poll
+            session_data = await self.get_verification_session_db(session_id)
+            if not session_data or session_data['status'] != 'pending' or session_data['is_expired']:
+                return session_data
+        
+        if session.get('cancelled'):
+            return None
+        return await self.get_verification_session_db(session_id)
+    
     def update_election_statuses_periodically(self):
         """Update election statuses every minute"""
-        import time
-        
         while True:
             try:
                 self.update_election_statuses()
-                time.sleep(60)  # Check every minute
             except Exception as e:
                 logger.error(f"Error updating election statuses: {e}")
-                time.sleep(60)
+            finally:
+                # This thread lives for the whole bot run; release its
+                # connection instead of holding the SQLite file open.
+                # close_old_connections() would keep it for CONN_MAX_AGE,
+                # which outlasts the sleep below, so close it outright.
+                connection.close()
+            time.sleep(60)  # Check every minute
     
     def update_election_statuses(self):
         """Update election statuses based on current time"""
         try:
-            from django.db import transaction
-            
             now = timezone.now()
             
             with transaction.atomic():
@@ -234,12 +387,8 @@ class Command(BaseCommand):
     
     @sync_to_async
     def remove_admin_db(self, telegram_id):
-        try:
-            admin = Admin.objects.get(telegram_id=telegram_id)
-            admin.delete()
-            return True
-        except Admin.DoesNotExist:
-            return False
+        deleted, _ = Admin.objects.filter(telegram_id=telegram_id).delete()
+        return deleted > 0
     
     @sync_to_async
     def create_voter_db(self, matric_number):
@@ -285,7 +434,7 @@ class Command(BaseCommand):
             now = timezone.now()
             if election.end_time <= now and election.status != 'ended':
                 election.status = 'ended'
-                election.save()
+                election.save(update_fields=['status'])
             
             # Get positions
             positions = election.candidates.values_list('position', flat=True).distinct()
@@ -298,8 +447,6 @@ class Command(BaseCommand):
                 'positions': {}
             }
             
-            total_voters = 0
-            
             for position in positions:
                 # Get candidates for this position with vote counts
                 candidates = election.candidates.filter(position=position).annotate(
@@ -328,10 +475,8 @@ class Command(BaseCommand):
                     'candidates': position_results,
                     'total_votes': position_total_votes
                 }
-                
-                total_voters = max(total_voters, position_total_votes)
             
-            results['total_voters'] = total_voters
+            results['total_voters'] = Vote.objects.filter(election=election).values('matric_number').distinct().count()
             return results
             
         except Election.DoesNotExist:
@@ -347,7 +492,7 @@ class Command(BaseCommand):
         return list(positions)
     
     @sync_to_async
-    def create_candidate_db(self, name, position, election_id, image_path=None):
+    def create_candidate_db(self, name, position, election_id, image_path=None, file_id=''):
         try:
             election = Election.objects.get(id=election_id)
             
@@ -360,6 +505,7 @@ class Command(BaseCommand):
             # Handle image if provided
             if image_path and os.path.exists(os.path.join(settings.MEDIA_ROOT, image_path)):
                 candidate.image = image_path
+                candidate.telegram_file_id = file_id
             
             candidate.save()
             logger.info(f"Created candidate {name} for election {election_id}")
@@ -385,7 +531,7 @@ class Command(BaseCommand):
                         image_url = c.image.url
                     except:
                         image_url = None
-                result.append((str(c.id), c.name, c.position, image_url))
+                result.append((str(c.id), c.name, c.position, image_url, c.telegram_file_id))
             return result
         except Exception as e:
             logger.error(f"Error getting candidates: {e}")
@@ -393,8 +539,9 @@ class Command(BaseCommand):
     
     @sync_to_async
     def get_candidates_db(self, election_id):
+        """Get candidates for an election, ordered so they group by position"""
         try:
-            candidates = Candidate.objects.filter(election_id=election_id)
+            candidates = Candidate.objects.filter(election_id=election_id).order_by('position', 'name')
             result = []
             for c in candidates:
                 image_url = None
@@ -403,12 +550,16 @@ class Command(BaseCommand):
                         image_url = c.image.url
                     except:
                         image_url = None
-                result.append((str(c.id), c.name, c.position, image_url))
+                result.append((str(c.id), c.name, c.position, image_url, c.telegram_file_id))
             return result
         except Exception as e:
             logger.error(f"Error getting candidates: {e}")
             return []
     
+    @sync_to_async
+    def set_candidate_file_id_db(self, candidate_id, file_id):
+        Candidate.objects.filter(id=candidate_id).update(telegram_file_id=file_id)
+    
     @sync_to_async
     def create_report_db(self, voter_id, issue):
         report = Report.objects.create(voter_id=str(voter_id), issue=issue)
@@ -445,70 +596,143 @@ class Command(BaseCommand):
         return Vote.objects.filter(matric_number=matric, election_id=election_id).exists()
 
     @sync_to_async
-    def create_vote_db(self, matric, candidate_id, election_id, timestamp):
+    def create_votes_db(self, matric, election_id, candidate_ids):
+        """Record every choice on a ballot in a single transaction"""
         try:
-            import hashlib
-            
-            # Generate vote hash
-            vote_string = f"{matric}:{candidate_id}:{election_id}:{timestamp}"
-            vote_hash = hashlib.sha256(vote_string.encode()).hexdigest()
-            
-            # Create vote record
-            vote = Vote.objects.create(
-                matric_number_id=matric,
-                candidate_id=candidate_id,
-                election_id=election_id,
-                vote_hash=vote_hash,
-                timestamp=timezone.now()
-            )
-            return vote_hash
+            timestamp = timezone.now()
+            # Hash the integer epoch time rather than formatting an ISO string per vote
+            hash_timestamp = time.time_ns()
+            with transaction.atomic():
+                # Claim the voter's one ballot first; a concurrent second
+                # ballot fails on its unique constraint even if its positions
+                # differ, so the has-voted check can't be raced
+                Ballot.objects.create(matric_number_id=matric, election_id=election_id)
+                positions = {
+                    str(candidate_id): position
+                    for candidate_id, position in Candidate.objects.filter(
+                        id__in=candidate_ids, election_id=election_id
+                    ).values_list('id', 'position')
+                }
+                if len(positions) != len({str(c) for c in candidate_ids}):
+                    raise ValueError("Ballot contains a candidate outside this election")
+                votes = [
+                    Vote(
+                        matric_number_id=matric,
+                        candidate_id=candidate_id,
+                        election_id=election_id,
+                        position=positions[str(candidate_id)],
+                        vote_hash=Vote.generate_hash(matric, candidate_id, election_id, hash_timestamp),
+                        timestamp=timestamp
+                    )
+                    for candidate_id in candidate_ids
+                ]
+                # All or nothing: a duplicate ballot or position rolls back everything
+                Vote.objects.bulk_create(votes)
+            return [vote.vote_hash.hex() for vote in votes]
         except Exception as e:
-            logger.error(f"Error creating vote: {e}")
+            logger.error(f"Error creating votes: {e}")
+            return []
+    
+    @sync_to_async
+    def expire_sessions_db(self):
+        return VerificationSession.objects.filter(
+            status='pending',
+            expires_at__lt=timezone.now()
+        ).update(status='expired')
+    
+    async def cleanup_expired_sessions(self, context: ContextTypes.DEFAULT_TYPE):
+        """Mark expired verification sessions and forget any left in memory"""
+        try:
+            expired = await self.expire_sessions_db()
+            if expired:
+                logger.info(f"Marked {expired} verification sessions as expired")
+            
+            # Waiters discard their own sessions; this catches any that were
+            # left behind, e.g. by a conversation that was interrupted
+            stale = [
+                session_id for session_id, session in self.sessions.items()
+                if timezone.now() - session['created_at'] > timezone.timedelta(seconds=SESSION_TIMEOUT)
+            ]
+            for session_id in stale:
+                await self.discard_session(session_id)
+        except Exception as e:
+            logger.error(f"Error cleaning up expired sessions: {e}")
+    
+    async def send_candidate_photo(self, message, candidate_id, image_url, file_id, caption):
+        """
+        Send a candidate's photo, uploading it from disk only the first time.
+        Telegram's file_id for the upload is saved so later sends reuse it.
+        Returns None if the image file is missing.
+        """
+        if file_id:
+            try:
+                return await message.reply_photo(photo=file_id, caption=caption)
+            except BadRequest as e:
+                # The file_id is no longer valid (e.g. the bot token changed);
+                # forget it and upload the file again
+                logger.warning(f"Stored photo for candidate {candidate_id} rejected, re-uploading: {e}")
+                await self.set_candidate_file_id_db(candidate_id, '')
+        
+        # Convert relative URL to full path for sending
+        image_path = os.path.join(settings.MEDIA_ROOT, image_url.removeprefix('/media/'))
+        if not os.path.exists(image_path):
             return None
+        
+        with open(image_path, 'rb') as photo:
+            sent = await message.reply_photo(photo=photo, caption=caption)
+        await self.set_candidate_file_id_db(candidate_id, sent.photo[-1].file_id)
+        return sent
     
-    def cleanup_expired_sessions(self):
-        """Clean up expired sessions periodically."""
-        import time
+    async def get_active_elections(self, context):
+        """Return active elections, reusing a recent result from bot_data"""
+        cached = context.bot_data.get('active_elections_cache')
+        now = time.monotonic()
+        if cached and now - cached[0] < ACTIVE_ELECTIONS_TTL:
+            return cached[1]
         
-        while True:
-            try:
-                time.sleep(60)
-            except Exception as e:
-                logger.error(f"Error in cleanup thread: {e}")
-                time.sleep(60)
+        elections = await self.get_active_elections_db()
+        context.bot_data['active_elections_cache'] = (now, elections)
+        return elections
+    
+    async def cached_id_check(self, context, cache_name, key, ttl, check_db):
+        """Check an {id: time cached} cache in bot_data, asking the database on a miss or once ttl has passed"""
+        cache = context.bot_data.setdefault(cache_name, {})
+        now = time.monotonic()
+        cached_at = cache.get(key)
+        if cached_at is not None and now - cached_at < ttl:
+            return True
+        if await check_db(key):
+            cache[key] = now
+            return True
+        cache.pop(key, None)
+        return False
+    
+    async def is_admin_user(self, context, telegram_id):
+        """Check the cached admin IDs, falling back to the database"""
+        return await self.cached_id_check(context, 'admin_ids', telegram_id, ADMIN_IDS_TTL, self.check_admin_db)
+    
+    async def is_registered_voter(self, context, matric):
+        """Check the cached voter IDs, falling back to the database"""
+        return await self.cached_id_check(context, 'voter_ids', matric, VOTER_IDS_TTL, self.check_voter_db)
     
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
         logger.info(f"User {user.id} started the bot")
         await update.message.reply_text(
             f"Hello {user.first_name}! Welcome to the E-Voting Bot.\n\n"
-            "Commands:\n"
-            "/vote - Cast your vote\n"
-            "/help - View commands\n"
-            "/view_candidate - View candidates\n"
-            "/results - View election results\n"
-            "/report - Report an issue\n"
-            "/admin - Admin functions"
+            f"Commands:\n{COMMANDS_TEXT}"
         )
         return ConversationHandler.END
     
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        await update.message.reply_text(
-            "Available Commands:\n"
-            "/vote - Cast your vote\n"
-            "/help - View commands\n"
-            "/view_candidate - View candidates\n"
-            "/results - View election results\n"
-            "/report - Report an issue\n"
-            "/admin - Admin functions"
-        )
+        await update.message.reply_text(HELP_TEXT)
     
     async def admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.info(f"User {update.effective_user.id} requested admin access")
         
         # Check if user is admin in database first
         user_id = str(update.effective_user.id)
-        is_admin = await self.check_admin_db(user_id)
+        is_admin = await self.is_admin_user(context, user_id)
         
         if not is_admin:
             await update.message.reply_text(
@@ -521,6 +745,7 @@ class Command(BaseCommand):
         try:
             # Create verification session
             session_id = await self.create_verification_session_db(user_id, 'admin')
+            await self.register_session(session_id)
             
             verification_url = f"{settings.BASE_URL}/verification/capture/{session_id}/"
             
@@ -529,60 +754,44 @@ class Command(BaseCommand):
                 f"Please click the link below to complete face verification:\n"
                 f"{verification_url}\n\n"
                 f"This link will expire in 10 minutes.\n"
-                f"After completing verification, return here and type /check_admin"
+                f"You will be notified here as soon as verification is complete."
             )
-            context.user_data['admin_session_id'] = session_id
-            return WAITING_FACE_CAPTURE
+            context.user_data['pending_session_id'] = session_id
         except Exception as e:
             logger.error(f"Admin session creation failed for user {update.effective_user.id}: {e}")
             await update.message.reply_text("❌ Error initiating admin verification. Please try again later.")
             return ConversationHandler.END
-    
-    async def check_admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        session_id = context.user_data.get('admin_session_id')
-        if not session_id:
-            await update.message.reply_text("No verification session found. Please use /admin to start.")
-            return ConversationHandler.END
         
         try:
-            session_data = await self.get_verification_session_db(session_id)
-            
-            if not session_data:
-                await update.message.reply_text("❌ Verification session not found. Please start again with /admin.")
-                return ConversationHandler.END
-            
-            if session_data['status'] == 'completed' and session_data['result'] and session_data['result'].get('verified'):
-                logger.info(f"Admin {update.effective_user.id} verified successfully")
-                context.user_data['is_admin'] = True
-                
-                keyboard = [
-                    [InlineKeyboardButton("Create Election", callback_data='create_election')],
-                    [InlineKeyboardButton("Add Candidate", callback_data='add_candidate')],
-                    [InlineKeyboardButton("View Candidates", callback_data='view_candidates')],
-                    [InlineKeyboardButton("View Results", callback_data='view_results')],
-                    [InlineKeyboardButton("View Reports", callback_data='view_reports')],
-                    [InlineKeyboardButton("Add Admin", callback_data='add_admin')],
-                    [InlineKeyboardButton("Remove Admin", callback_data='remove_admin')],
-                    [InlineKeyboardButton("Add Voter", callback_data='add_voter')],
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await update.message.reply_text("✅ Admin verified! Choose an action:", reply_markup=reply_markup)
-                return ADMIN_ACTION
-            elif session_data['status'] == 'completed' and session_data['result'] and not session_data['result'].get('verified'):
-                logger.warning(f"Admin verification failed for user {update.effective_user.id}")
-                await update.message.reply_text("❌ Admin verification failed. Access denied.")
-                return ConversationHandler.END
-            elif session_data['is_expired']:
-                logger.warning(f"Admin verification session expired for user {update.effective_user.id}")
-                await update.message.reply_text("❌ Verification session expired. Please start again with /admin.")
-                return ConversationHandler.END
-            else:
-                await update.message.reply_text("⏳ Verification still in progress. Please complete the face capture and try again.")
-                return WAITING_FACE_CAPTURE
+            session_data = await self.wait_for_session(session_id)
+            return await self.admin_verification_result(update, context, session_data)
         except Exception as e:
             logger.error(f"Error checking admin verification: {e}")
             await update.message.reply_text("❌ Error checking verification status.")
             return ConversationHandler.END
+        finally:
+            context.user_data.pop('pending_session_id', None)
+            await self.discard_session(session_id)
+    
+    async def admin_verification_result(self, update: Update, context: ContextTypes.DEFAULT_TYPE, session_data):
+        if not session_data:
+            await update.message.reply_text("❌ Verification cancelled. Please start again with /admin.")
+            return ConversationHandler.END
+        
+        if session_data['status'] == 'completed' and session_data['result'] and session_data['result'].get('verified'):
+            logger.info(f"Admin {update.effective_user.id} verified successfully")
+            context.user_data['is_admin'] = True
+            
+            await update.message.reply_text("✅ Admin verified! Choose an action:", reply_markup=ADMIN_MENU_MARKUP)
+            return ADMIN_ACTION
+        elif session_data['status'] == 'completed':
+            logger.warning(f"Admin verification failed for user {update.effective_user.id}")
+            await update.message.reply_text("❌ Admin verification failed. Access denied.")
+            return ConversationHandler.END
+        else:
+            logger.warning(f"Admin verification session expired for user {update.effective_user.id}")
+            await update.message.reply_text("❌ Verification session expired. Please start again with /admin.")
+            return ConversationHandler.END
     
     async def admin_action(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         query = update.callback_query
@@ -601,7 +810,7 @@ class Command(BaseCommand):
             
         elif action == 'add_candidate':
             # Get active elections for candidate addition
-            active_elections = await self.get_active_elections_db()
+            active_elections = await self.get_active_elections(context)
             if not active_elections:
                 await query.message.reply_text("❌ No active elections available to add candidates.")
                 return ADMIN_ACTION
@@ -616,7 +825,7 @@ class Command(BaseCommand):
             return SELECT_ELECTION_FOR_CANDIDATE
             
         elif action == 'view_candidates':
-            active_elections = await self.get_active_elections_db()
+            active_elections = await self.get_active_elections(context)
             if not active_elections:
                 await query.message.reply_text("❌ No active elections available.")
                 return ADMIN_ACTION
@@ -697,18 +906,7 @@ class Command(BaseCommand):
             
         elif action == 'back_to_admin':
             # Return to admin menu
-            keyboard = [
-                [InlineKeyboardButton("Create Election", callback_data='create_election')],
-                [InlineKeyboardButton("Add Candidate", callback_data='add_candidate')],
-                [InlineKeyboardButton("View Candidates", callback_data='view_candidates')],
-                [InlineKeyboardButton("View Results", callback_data='view_results')],
-                [InlineKeyboardButton("View Reports", callback_data='view_reports')],
-                [InlineKeyboardButton("Add Admin", callback_data='add_admin')],
-                [InlineKeyboardButton("Remove Admin", callback_data='remove_admin')],
-                [InlineKeyboardButton("Add Voter", callback_data='add_voter')],
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.message.reply_text("🔧 Admin Panel - Choose an action:", reply_markup=reply_markup)
+            await query.message.reply_text("🔧 Admin Panel - Choose an action:", reply_markup=ADMIN_MENU_MARKUP)
             return ADMIN_ACTION
         
         return ADMIN_ACTION
@@ -886,6 +1084,7 @@ class Command(BaseCommand):
                 return ADMIN_ACTION
 
             image_path = None
+            file_id = ''
 
             if skip_photo or (update.message.text and update.message.text.strip() == '/skip'):
                 await update.message.reply_text("⏳ Adding candidate without photo...")
@@ -909,6 +1108,8 @@ class Command(BaseCommand):
                     # Download and save the image
                     await file.download_to_drive(full_image_path)
                     image_path = f"candidate_images/{image_filename}"  # Relative path for database
+                    # The photo already lives on Telegram's servers; reuse it when showing candidates
+                    file_id = photo.file_id
                     await update.message.reply_text("✅ Photo uploaded successfully!")
                 except Exception as e:
                     logger.error(f"Error downloading photo: {e}")
@@ -928,7 +1129,8 @@ class Command(BaseCommand):
                     candidate_data['name'],
                     candidate_data['position'],
                     candidate_data['election_id'],
-                    image_path
+                    image_path,
+                    file_id
                 )
                 
                 if candidate_id:
@@ -942,18 +1144,7 @@ class Command(BaseCommand):
                     )
                     
                     # Show admin menu again
-                    keyboard = [
-                        [InlineKeyboardButton("Create Election", callback_data='create_election')],
-                        [InlineKeyboardButton("Add Candidate", callback_data='add_candidate')],
-                        [InlineKeyboardButton("View Candidates", callback_data='view_candidates')],
-                        [InlineKeyboardButton("View Results", callback_data='view_results')],
-                        [InlineKeyboardButton("View Reports", callback_data='view_reports')],
-                        [InlineKeyboardButton("Add Admin", callback_data='add_admin')],
-                        [InlineKeyboardButton("Remove Admin", callback_data='remove_admin')],
-                        [InlineKeyboardButton("Add Voter", callback_data='add_voter')],
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    await update.message.reply_text("🔧 Admin Panel - Choose an action:", reply_markup=reply_markup)
+                    await update.message.reply_text("🔧 Admin Panel - Choose an action:", reply_markup=ADMIN_MENU_MARKUP)
                 else:
                     await update.message.reply_text("❌ Error creating candidate. Election may not exist.")
                     
@@ -978,19 +1169,23 @@ class Command(BaseCommand):
     
     async def create_election(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            input_text = update.message.text
-            title, start_time, end_time = [x.strip() for x in input_text.split(',')]
-            start_time = timezone.datetime.strptime(start_time, '%Y-%m-%d %H:%M')
-            end_time = timezone.datetime.strptime(end_time, '%Y-%m-%d %H:%M')
+            input_text = update.message.text.strip()
+            title, start_time, end_time = FIELD_SEPARATOR_RE.split(input_text, maxsplit=2)
+            # fromisoformat accepts "YYYY-MM-DD HH:MM" as well as full ISO 8601
+            start_time = timezone.datetime.fromisoformat(start_time)
+            end_time = timezone.datetime.fromisoformat(end_time)
+            
+            # Make timezone aware unless an offset was given
+            if timezone.is_naive(start_time):
+                start_time = timezone.make_aware(start_time)
+            if timezone.is_naive(end_time):
+                end_time = timezone.make_aware(end_time)
             
             if end_time <= start_time:
                 raise ValueError("End time must be after start time")
             
-            # Make timezone aware
-            start_time = timezone.make_aware(start_time)
-            end_time = timezone.make_aware(end_time)
-            
             election_id = await self.create_election_db(title, start_time, end_time)
+            context.bot_data.pop('active_elections_cache', None)
             await update.message.reply_text(f"✅ Election '{title}' created successfully!\nElection ID: {election_id}")
             return ADMIN_ACTION
         except Exception as e:
@@ -1006,6 +1201,7 @@ class Command(BaseCommand):
                 return ADD_ADMIN
             
             created = await self.create_admin_db(admin_id)
+            context.bot_data.setdefault('admin_ids', {})[admin_id] = time.monotonic()
             if created:
                 await update.message.reply_text(f"✅ Admin {admin_id} added successfully!")
             else:
@@ -1020,6 +1216,7 @@ class Command(BaseCommand):
         try:
             admin_id = update.message.text.strip()
             removed = await self.remove_admin_db(admin_id)
+            context.bot_data.setdefault('admin_ids', {}).pop(admin_id, None)
             if removed:
                 await update.message.reply_text(f"✅ Admin {admin_id} removed successfully!")
             else:
@@ -1034,6 +1231,7 @@ class Command(BaseCommand):
         try:
             matric = update.message.text.strip().upper()
             created = await self.create_voter_db(matric)
+            context.bot_data.setdefault('voter_ids', {})[matric] = time.monotonic()
             if created:
                 await update.message.reply_text(f"✅ Voter {matric} added successfully!")
             else:
@@ -1053,7 +1251,7 @@ class Command(BaseCommand):
         debug_msg += f"User ID: {update.effective_user.id}\n"
         
         # Check elections
-        elections = await self.get_active_elections_db()
+        elections = await self.get_active_elections(context)
         debug_msg += f"Active Elections: {len(elections)}\n"
     
         await update.message.reply_text(debug_msg)
@@ -1063,7 +1261,7 @@ class Command(BaseCommand):
         
         # Check if there are active elections
         try:
-            active_elections = await self.get_active_elections_db()
+            active_elections = await self.get_active_elections(context)
             if not active_elections:
                 await update.message.reply_text("❌ No active elections available at this time.")
                 return ConversationHandler.END
@@ -1071,6 +1269,7 @@ class Command(BaseCommand):
             # Create verification session for voting
             user_id = str(update.effective_user.id)
             session_id = await self.create_verification_session_db(user_id, 'vote')
+            await self.register_session(session_id)
             
             verification_url = f"{settings.BASE_URL}/verification/capture/{session_id}/"
             
@@ -1079,74 +1278,68 @@ class Command(BaseCommand):
                 f"Please click the link below to complete face verification:\n"
                 f"{verification_url}\n\n"
                 f"This link will expire in 10 minutes.\n"
-                f"After completing verification, return here and type /check_vote"
+                f"You will be notified here as soon as verification is complete."
             )
-            context.user_data['vote_session_id'] = session_id
-            return WAITING_FACE_CAPTURE
+            context.user_data['pending_session_id'] = session_id
             
         except Exception as e:
             logger.error(f"Vote session creation failed for user {update.effective_user.id}: {e}")
             await update.message.reply_text("❌ Error initiating voter verification. Please try again later.")
             return ConversationHandler.END
+        
+        try:
+            session_data = await self.wait_for_session(session_id)
+            return await self.vote_verification_result(update, context, session_data)
+        except Exception as e:
+            logger.error(f"Error checking vote verification: {e}")
+            await update.message.reply_text("❌ Error checking verification status.")
+            return ConversationHandler.END
+        finally:
+            context.user_data.pop('pending_session_id', None)
+            await self.discard_session(session_id)
 
-    async def check_vote(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        session_id = context.user_data.get('vote_session_id')
-        if not session_id:
-            await update.message.reply_text("No verification session found. Please use /vote to start.")
+    async def vote_verification_result(self, update: Update, context: ContextTypes.DEFAULT_TYPE, session_data):
+        if not session_data:
+            await update.message.reply_text("❌ Verification cancelled. Please start again with /vote.")
             return ConversationHandler.END
         
-        try:
-            session_data = await self.get_verification_session_db(session_id)
-            
-            if not session_data:
-                await update.message.reply_text("❌ Verification session not found. Please start again with /vote.")
+        if session_data['status'] == 'completed' and session_data['result'] and session_data['result'].get('verified'):
+            matric = session_data['result'].get('matric')
+            logger.info(f"Voter {matric} verified successfully")
+            
+            # Check if voter exists in database
+            voter_exists = await self.is_registered_voter(context, matric)
+            if not voter_exists:
+                await update.message.reply_text("❌ Voter not registered in database. Please contact an administrator.")
                 return ConversationHandler.END
             
-            if session_data['status'] == 'completed' and session_data['result'] and session_data['result'].get('verified'):
-                matric = session_data['result'].get('matric')
-                logger.info(f"Voter {matric} verified successfully")
-                
-                # Check if voter exists in database
-                voter_exists = await self.check_voter_db(matric)
-                if not voter_exists:
-                    await update.message.reply_text("❌ Voter not registered in database. Please contact an administrator.")
-                    return ConversationHandler.END
-                
-                context.user_data['verified_matric'] = matric
-                
-                # Show available elections
-                active_elections = await self.get_active_elections_db()
-                if not active_elections:
-                    await update.message.reply_text("❌ No active elections available.")
-                    return ConversationHandler.END
-                
-                keyboard = [
-                    [InlineKeyboardButton(title, callback_data=f"vote_election_{election_id}")]
-                    for election_id, title, _, _ in active_elections
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await update.message.reply_text(
-                    f"✅ Voter verified! Welcome {matric}\n\n"
-                    f"Select an election to vote in:",
-                    reply_markup=reply_markup
-                )
-                return VOTER_VOTE
+            context.user_data['verified_matric'] = matric
             
-            elif session_data['status'] == 'completed' and session_data['result'] and not session_data['result'].get('verified'):
-                logger.warning(f"Voter verification failed for user {update.effective_user.id}")
-                await update.message.reply_text("❌ Voter verification failed. Please ensure you are registered and try again.")
-                return ConversationHandler.END
-            elif session_data['is_expired']:
-                logger.warning(f"Voter verification session expired for user {update.effective_user.id}")
-                await update.message.reply_text("❌ Verification session expired. Please start again with /vote.")
+            # Show available elections
+            active_elections = await self.get_active_elections(context)
+            if not active_elections:
+                await update.message.reply_text("❌ No active elections available.")
                 return ConversationHandler.END
-            else:
-                await update.message.reply_text("⏳ Verification still in progress. Please complete the face capture and try again.")
-                return WAITING_FACE_CAPTURE
             
-        except Exception as e:
-            logger.error(f"Error checking vote verification: {e}")
-            await update.message.reply_text("❌ Error checking verification status.")
+            keyboard = [
+                [InlineKeyboardButton(title, callback_data=f"vote_election_{election_id}")]
+                for election_id, title, _, _ in active_elections
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            await update.message.reply_text(
+                f"✅ Voter verified! Welcome {matric}\n\n"
+                f"Select an election to vote in:",
+                reply_markup=reply_markup
+            )
+            return VOTER_VOTE
+        
+        elif session_data['status'] == 'completed':
+            logger.warning(f"Voter verification failed for user {update.effective_user.id}")
+            await update.message.reply_text("❌ Voter verification failed. Please ensure you are registered and try again.")
+            return ConversationHandler.END
+        else:
+            logger.warning(f"Voter verification session expired for user {update.effective_user.id}")
+            await update.message.reply_text("❌ Verification session expired. Please start again with /vote.")
             return ConversationHandler.END
 
     async def voter_vote(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1259,19 +1452,15 @@ class Command(BaseCommand):
         
         # Send each candidate with image
         keyboard = []
-        for candidate_id, name, position, image_url in candidates:
+        for candidate_id, name, position, image_url, file_id in candidates:
             # Send candidate image if available
             if image_url:
                 try:
-                    # Convert relative URL to full path for sending
-                    image_path = os.path.join(settings.MEDIA_ROOT, image_url.lstrip('/media/'))
-                    if os.path.exists(image_path):
-                        with open(image_path, 'rb') as photo:
-                            await query.message.reply_photo(
-                                photo=photo,
-                                caption=f"👤 **{name}**\n📍 {position}"
-                            )
-                    else:
+                    sent = await self.send_candidate_photo(
+                        query.message, candidate_id, image_url, file_id,
+                        caption=f"👤 **{name}**\n📍 {position}"
+                    )
+                    if not sent:
                         await query.message.reply_text(f"👤 **{name}**\n📍 {position}\n📸 Image not available")
                 except Exception as e:
                     logger.error(f"Error sending candidate image: {e}")
@@ -1306,7 +1495,7 @@ class Command(BaseCommand):
         for position, candidate_id in votes.items():
             candidates = await self.get_candidates_by_position_db(election_id, position)
             candidate_name = "Unknown"
-            for cid, name, _, _ in candidates:
+            for cid, name, _, _, _ in candidates:
                 if cid == candidate_id:
                     candidate_name = name
                     break
@@ -1334,13 +1523,11 @@ class Command(BaseCommand):
                 await query.message.reply_text("❌ Missing voting data. Please start again.")
                 return
             
-            # Submit votes
-            vote_hashes = []
-            for position, candidate_id in votes.items():
-                timestamp = timezone.now().isoformat()
-                vote_hash = await self.create_vote_db(matric, candidate_id, election_id, timestamp)
-                if vote_hash:
-                    vote_hashes.append(vote_hash[:16])
+            # Submit all votes in one transaction
+            vote_hashes = [
+                vote_hash[:16]
+                for vote_hash in await self.create_votes_db(matric, election_id, list(votes.values()))
+            ]
             
             if vote_hashes:
                 await query.message.reply_text(
@@ -1373,7 +1560,7 @@ class Command(BaseCommand):
         return ConversationHandler.END
     
     async def view_candidate(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        active_elections = await self.get_active_elections_db()
+        active_elections = await self.get_active_elections(context)
         if not active_elections:
             await update.message.reply_text("❌ No active elections available.")
             return ConversationHandler.END
@@ -1400,30 +1587,19 @@ class Command(BaseCommand):
             if not candidates:
                 await query.message.reply_text("❌ No candidates found for this election.")
             else:
-                # Group candidates by position
-                positions = {}
-                for candidate_id, name, position, image_url in candidates:
-                    if position not in positions:
-                        positions[position] = []
-                    positions[position].append((candidate_id, name, image_url))
-                
-                # Send candidates by position
-                for position, position_candidates in positions.items():
+                # Send candidates by position; the query already orders them by position
+                for position, position_candidates in itertools.groupby(candidates, key=lambda c: c[2]):
                     await query.message.reply_text(f"📍 **{position}**")
                     
-                    for candidate_id, name, image_url in position_candidates:
+                    for candidate_id, name, _, image_url, file_id in position_candidates:
                         # Send candidate with image
                         if image_url:
                             try:
-                                # Convert relative URL to full path
-                                image_path = os.path.join(settings.MEDIA_ROOT, image_url.lstrip('/media/'))
-                                if os.path.exists(image_path):
-                                    with open(image_path, 'rb') as photo:
-                                        await query.message.reply_photo(
-                                            photo=photo,
-                                            caption=f"👤 **{name}**\n📍 {position}\n🆔 {candidate_id[:8]}..."
-                                        )
-                                else:
+                                sent = await self.send_candidate_photo(
+                                    query.message, candidate_id, image_url, file_id,
+                                    caption=f"👤 **{name}**\n📍 {position}\n🆔 {candidate_id[:8]}..."
+                                )
+                                if not sent:
                                     await query.message.reply_text(
                                         f"👤 **{name}**\n📍 {position}\n🆔 {candidate_id[:8]}...\n📸 Image not found"
                                     )
@@ -1449,8 +1625,8 @@ class Command(BaseCommand):
     async def results(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /results command - show results for ended elections"""
         try:
-            # Update election statuses first
-            self.update_election_statuses()
+            # Update election statuses first (ORM work, so off the event loop)
+            await sync_to_async(self.update_election_statuses)()
             
             # Get ended elections
             ended_elections = await self.get_ended_elections_db()
@@ -1490,9 +1666,22 @@ class Command(BaseCommand):
             await update.message.reply_text("❌ Error retrieving results.")
             return ConversationHandler.END
     
-    async def check_voter_registration(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        await update.message.reply_text("Voter registration checking feature coming soon!")
-        return ConversationHandler.END
+    async def verification_in_progress(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Reply to messages sent while a face verification is outstanding"""
+        if update.message:
+            await update.message.reply_text(
+                "⏳ Verification still in progress. Please complete the face capture using the link above, "
+                "or send /cancel to stop."
+            )
+        elif update.callback_query:
+            await update.callback_query.answer("Verification still in progress.")
+    
+    async def cancel_verification(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Stop waiting for the outstanding face verification"""
+        session = self.sessions.get(context.user_data.get('pending_session_id'))
+        if session:
+            session['cancelled'] = True
+            session['event'].set()
     
     async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Operation cancelled.")
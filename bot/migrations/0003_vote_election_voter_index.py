@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0002_vote_election_candidate_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['election', 'matric_number'], name='bot_vote_election_voter_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:30
+
+from django.db import migrations, models
+
+
+def hex_hashes_to_bytes(apps, schema_editor):
+    """Convert existing hex digests into raw 32-byte digests."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT id, vote_hash FROM bot_vote")
+        rows = [(bytes.fromhex(vote_hash), vote_id) for vote_id, vote_hash in cursor.fetchall() if isinstance(vote_hash, str)]
+        cursor.executemany("UPDATE bot_vote SET vote_hash = %s WHERE id = %s", rows)
+
+
+def bytes_hashes_to_hex(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT id, vote_hash FROM bot_vote")
+        rows = [(bytes(vote_hash).hex(), vote_id) for vote_id, vote_hash in cursor.fetchall() if not isinstance(vote_hash, str)]
+        cursor.executemany("UPDATE bot_vote SET vote_hash = %s WHERE id = %s", rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0003_vote_election_voter_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vote',
+            name='vote_hash',
+            field=models.BinaryField(max_length=32),
+        ),
+        migrations.RunPython(hex_hashes_to_bytes, bytes_hashes_to_hex),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0004_vote_hash_binary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='candidate',
+            name='telegram_file_id',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
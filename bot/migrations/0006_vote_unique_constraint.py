@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:43
+
+from django.db import migrations, models
+
+
+def copy_candidate_positions(apps, schema_editor):
+    """Fill Vote.position from each vote's candidate."""
+    Vote = apps.get_model('bot', 'Vote')
+    Candidate = apps.get_model('bot', 'Candidate')
+    positions = dict(Candidate.objects.values_list('id', 'position'))
+    votes = list(Vote.objects.only('id', 'candidate_id'))
+    for vote in votes:
+        vote.position = positions[vote.candidate_id]
+    Vote.objects.bulk_update(votes, ['position'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0005_candidate_telegram_file_id'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='position',
+            field=models.CharField(default='', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_candidate_positions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('matric_number', 'election', 'position'), name='uniq_voter_election_position'),
+        ),
+    ]
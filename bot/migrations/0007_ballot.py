@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-15 23:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_ballots_for_existing_votes(apps, schema_editor):
+    """Record a ballot for every voter who already voted in an election."""
+    Vote = apps.get_model('bot', 'Vote')
+    Ballot = apps.get_model('bot', 'Ballot')
+    pairs = Vote.objects.values_list('matric_number_id', 'election_id').distinct()
+    Ballot.objects.bulk_create(
+        [Ballot(matric_number_id=matric, election_id=election) for matric, election in pairs],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot', '0006_vote_unique_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ballot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cast_at', models.DateTimeField(auto_now_add=True)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bot.election')),
+                ('matric_number', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bot.voter')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ballot',
+            constraint=models.UniqueConstraint(fields=('matric_number', 'election'), name='uniq_ballot_voter_election'),
+        ),
+        migrations.RunPython(create_ballots_for_existing_votes, migrations.RunPython.noop),
+    ]
@@ -51,25 +51,64 @@ class Candidate(models.Model):
     name = models.CharField(max_length=255)
     position = models.CharField(max_length=100)
     image = models.ImageField(upload_to='candidate_images/', null=True, blank=True)
+    # Telegram file_id of the uploaded image, so the bot can resend it
+    # without reading or uploading the file again
+    telegram_file_id = models.CharField(max_length=255, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"{self.name} - {self.position}"
 
+class Ballot(models.Model):
+    """Marks that a voter has cast their ballot in an election.
+
+    Votes are unique only per position, so this row is what stops a voter
+    from casting a second ballot for other positions.
+    """
+    matric_number = models.ForeignKey(Voter, on_delete=models.CASCADE)
+    election = models.ForeignKey(Election, on_delete=models.CASCADE)
+    cast_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['matric_number', 'election'], name='uniq_ballot_voter_election'),
+        ]
+    
+    def __str__(self):
+        return f"{self.matric_number} - {self.election}"
+
 class Vote(models.Model):
     matric_number = models.ForeignKey(Voter, on_delete=models.CASCADE)
     election = models.ForeignKey(Election, on_delete=models.CASCADE)
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE)
-    vote_hash = models.CharField(max_length=64)
+    # Copied from the candidate so the database can enforce one vote per
+    # position on a ballot
+    position = models.CharField(max_length=100)
+    vote_hash = models.BinaryField(max_length=32)
     timestamp = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        unique_together = ('matric_number', 'election')
+        constraints = [
+            models.UniqueConstraint(fields=['matric_number', 'election', 'position'], name='uniq_voter_election_position'),
+        ]
+        indexes = [
+            models.Index(fields=['election', 'candidate'], name='bot_vote_election_cand_idx'),
+            models.Index(fields=['election', 'matric_number'], name='bot_vote_election_voter_idx'),
+        ]
     
     @staticmethod
     def generate_hash(matric, candidate_id, election_id, timestamp):
-        vote_string = f"{matric}:{candidate_id}:{election_id}:{timestamp}"
-        return hashlib.sha256(vote_string.encode()).hexdigest()
+        # BLAKE2b is in the standard library and is faster than SHA-256 on
+        # hosts without SHA extensions; 32 bytes keeps the column size
+        h = hashlib.blake2b(digest_size=32)
+        h.update(str(matric).encode())
+        h.update(b':')
+        h.update(str(candidate_id).encode())
+        h.update(b':')
+        h.update(str(election_id).encode())
+        h.update(b':')
+        h.update(str(timestamp).encode())
+        return h.digest()
     
     def __str__(self):
         return f"{self.matric_number} - {self.election}"
@@ -114,5 +153,10 @@ class VerificationSession(models.Model):
     def is_expired(self):
         return timezone.now() > self.expires_at
     
+    @staticmethod
+    def exists_cache_key(session_id):
+        """Cache key under which the websocket consumer remembers the session exists."""
+        return f"verification_session_exists:{session_id}"
+    
     def __str__(self):
         return f"{self.session_type} session for {self.user_id}"
@@ -1,5 +1,10 @@
 import os
+import json
 import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import numpy as np
 import cv2
 from mtcnn.mtcnn import MTCNN
@@ -8,13 +13,111 @@ from scipy import spatial
 import dlib
 from django.conf import settings
 
+# Numba is optional; without it the NumPy implementation below is used
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# ONNX Runtime is optional; FaceNet runs on TensorFlow without it
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+# fcntl is POSIX-only; without it the bank is only locked within one process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
+# All voter embeddings packed into one float16 matrix, with row order in the
+# id file. The search matrix is int8, so float16 loses nothing that matters.
+VOTER_BANK_FILE = 'embeddings.npy'
+VOTER_IDS_FILE = 'voter_ids.json'
+VOTER_BANK_LOCK_FILE = '.embeddings.lock'
+
+# Faces embedded per FaceNet call during bulk registration; bounds memory
+# while keeping batches large enough to use the hardware well
+EMBED_BATCH_SIZE = 64
+
+
+def _atomic_write(path, mode, write):
+    """Write a file through a uniquely named temp file, then swap it in."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def quantize_embeddings(embeddings):
+    """Quantize embeddings to int8 with one scale per row (last axis)."""
+    scales = np.abs(embeddings).max(axis=-1, keepdims=True) / 127.0
+    quantized = np.round(embeddings / scales).astype(np.int8)
+    return quantized, scales.squeeze(-1).astype(np.float32)
+
+
+# Cosine similarity is scale-invariant, so the per-row scales cancel out and
+# only the int8 rows and their norms are needed.
+def _cosine_distances_numpy(quantized, norms, query):
+    """Cosine distance from an int8 query to every row of an int8 matrix."""
+    # einsum accumulates in int32 without first copying the matrix to int32
+    dots = np.einsum('ij,j->i', quantized, query, dtype=np.int32)
+    return 1.0 - dots / (norms * np.linalg.norm(query.astype(np.float32)))
+
+
+if njit is not None:
+    # An explicit signature compiles the kernel at import (or loads it from
+    # the on-disk cache) instead of on the first verification request.
+    # Not parallel: searches run concurrently on the web server's CV threads,
+    # and Numba's default workqueue layer aborts if parallel regions are
+    # entered from several threads at once. A serial N x 512 int8 scan is
+    # cheap at voter-bank sizes anyway.
+    @njit('float32[:](int8[:, :], float32[:], int8[:])', fastmath=True, cache=True)
+    def _cosine_distances_numba(quantized, norms, query):
+        distances = np.empty(quantized.shape[0], np.float32)
+        query_norm = 0.0
+        for j in range(query.shape[0]):
+            query_norm += query[j] * query[j]
+        query_norm = np.sqrt(query_norm)
+        for i in range(quantized.shape[0]):
+            dot = 0
+            row = quantized[i]
+            for j in range(row.shape[0]):
+                dot += row[j] * query[j]
+            distances[i] = 1.0 - dot / (norms[i] * query_norm)
+        return distances
+
+    cosine_distances = _cosine_distances_numba
+else:
+    cosine_distances = _cosine_distances_numpy
+
+
+class OnnxFaceNet:
+    """Drop-in for keras_facenet.FaceNet that runs an exported model on ONNX Runtime."""
+
+    def __init__(self, model_path):
+        self.session = onnxruntime.InferenceSession(model_path, providers=onnxruntime.get_available_providers())
+        self.input_name = self.session.get_inputs()[0].name
+
+    def embeddings(self, images):
+        # Same preprocessing as FaceNet.embeddings for the default 20180402 model
+        images = [img if img.shape[:2] == (160, 160) else cv2.resize(img, (160, 160)) for img in images]
+        batch = (np.float32(images) - 127.5) / 127.5
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
 class FaceRecognizer:
     def __init__(self):
         logger.info("Initializing MTCNN, FaceNet, and Dlib")
         self.detector = MTCNN()
-        self.facenet = FaceNet()
+        self.facenet = self._load_facenet()
         
         # Load dlib shape predictor
         shape_predictor_path = os.path.join(settings.FACE_MODELS_PATH, 'dlib', 'shape_predictor_68_face_landmarks.dat')
@@ -23,24 +126,145 @@ class FaceRecognizer:
             raise FileNotFoundError(f"Shape predictor file not found at {shape_predictor_path}")
         
         self.predictor = dlib.shape_predictor(shape_predictor_path)
+        # Optional OpenCV face detectors (YuNet, then SSD); MTCNN is the fallback
+        self.yunet_detector = self._load_yunet_detector()
+        self.dnn_detector = self._load_dnn_detector()
+        if self.yunet_detector is not None:
+            logger.info("Using OpenCV YuNet face detector")
+        elif self.dnn_detector is not None:
+            logger.info("Using OpenCV DNN face detector")
+        # The OpenCV nets keep per-call state, so each thread gets its own
+        # copy (these are the loading thread's) and detection runs in parallel
+        self._detector_local = threading.local()
+        self._detector_local.yunet = self.yunet_detector
+        self._detector_local.dnn = self.dnn_detector
+        # MTCNN is one TensorFlow model, so threads take turns running it;
+        # FaceNet has its own lock so embedding overlaps detection
+        self._detector_lock = threading.Lock()
+        self._facenet_lock = threading.Lock()
         self.face_data_path = settings.FACE_DATA_PATH
         self.voter_encodings_path = os.path.join(self.face_data_path, 'voters')
         self.admin_encodings_path = os.path.join(self.face_data_path, 'admins')
         self.voter_encodings = {}
         self.admin_encodings = {}
+        self.voter_ids = []
+        self._voter_matrix = np.empty((0, 0), dtype=np.int8)
+        self._voter_norms = np.empty(0, dtype=np.float32)
+        # Guards the voter bank: registrations replace the arrays under it and
+        # searches take a consistent (ids, matrix, norms) snapshot
+        self._bank_lock = threading.Lock()
+        # Serialises bank file rewrites between threads; the flock in
+        # _locked_bank_files does the same between processes
+        self._bank_file_lock = threading.Lock()
         self.load_encodings()
 
-    def detect_and_align_face(self, img):
-        """Detect and align face from a NumPy array."""
+    def _load_facenet(self):
+        """Use the exported ONNX FaceNet if present, else the Keras model."""
+        model_path = os.path.join(settings.FACE_MODELS_PATH, 'facenet', 'facenet.onnx')
+        if onnxruntime is not None and os.path.exists(model_path):
+            try:
+                facenet = OnnxFaceNet(model_path)
+                logger.info("Using ONNX Runtime for FaceNet embeddings")
+                return facenet
+            except Exception as e:
+                logger.warning(f"Failed to load ONNX FaceNet, using Keras: {e}")
+        return FaceNet()
+
+    def _load_yunet_detector(self):
+        """Load OpenCV's YuNet face detector if its ONNX model exists."""
+        model_path = os.path.join(settings.FACE_MODELS_PATH, 'opencv', 'face_detection_yunet_2023mar.onnx')
+        if not os.path.exists(model_path) or not hasattr(cv2, 'FaceDetectorYN'):
+            return None
+        try:
+            backend, target = cv2.dnn.DNN_BACKEND_OPENCV, cv2.dnn.DNN_TARGET_CPU
+            if cv2.cuda.getCudaEnabledDeviceCount() > 0:
+                backend, target = cv2.dnn.DNN_BACKEND_CUDA, cv2.dnn.DNN_TARGET_CUDA
+            return cv2.FaceDetectorYN.create(model_path, "", (320, 320), 0.9, 0.3, 5000, backend, target)
+        except Exception as e:
+            logger.warning(f"Failed to load OpenCV YuNet face detector: {e}")
+            return None
+
+    def _load_dnn_detector(self):
+        """Load OpenCV's ResNet-10 SSD face detector if its model files exist."""
+        model_dir = os.path.join(settings.FACE_MODELS_PATH, 'opencv')
+        prototxt_path = os.path.join(model_dir, 'deploy.prototxt')
+        weights_path = os.path.join(model_dir, 'res10_300x300_ssd_iter_140000.caffemodel')
+        if not (os.path.exists(prototxt_path) and os.path.exists(weights_path)):
+            return None
+        try:
+            net = cv2.dnn.readNetFromCaffe(prototxt_path, weights_path)
+            if cv2.cuda.getCudaEnabledDeviceCount() > 0:
+                net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+                net.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA)
+            return net
+        except Exception as e:
+            logger.warning(f"Failed to load OpenCV DNN face detector, using MTCNN: {e}")
+            return None
+
+    def _thread_detector(self, name, load):
+        """Return this thread's copy of an OpenCV detector, loading it on first use."""
+        detector = getattr(self._detector_local, name, None)
+        if detector is None:
+            detector = load()
+            setattr(self._detector_local, name, detector)
+        return detector
+
+    def _detect_face_box(self, img):
+        """Return the (x, y, w, h) box of the most confident face, or None."""
+        if self.yunet_detector is not None:
+            h, w = img.shape[:2]
+            yunet = self._thread_detector('yunet', self._load_yunet_detector)
+            # YuNet is specialised to one input size; only resize it when frames change
+            if getattr(self._detector_local, 'yunet_input_size', None) != (w, h):
+                yunet.setInputSize((w, h))
+                self._detector_local.yunet_input_size = (w, h)
+            _, faces = yunet.detect(img)
+            if faces is None or not len(faces):
+                return None
+            x, y, fw, fh = faces[np.argmax(faces[:, -1]), :4].astype(int)
+            return max(x, 0), max(y, 0), fw, fh
+        if self.dnn_detector is None:
+            with self._detector_lock:
+                results = self.detector.detect_faces(img)
+            return results[0]['box'] if results else None
+        h, w = img.shape[:2]
+        blob = cv2.dnn.blobFromImage(img, 1.0, (300, 300), (104.0, 177.0, 123.0))
+        net = self._thread_detector('dnn', self._load_dnn_detector)
+        net.setInput(blob)
+        detections = net.forward()[0, 0]
+        if not len(detections):
+            return None
+        best = detections[np.argmax(detections[:, 2])]
+        if best[2] < 0.5:
+            return None
+        x1, y1, x2, y2 = (best[3:7] * np.array([w, h, w, h])).astype(int)
+        x1, y1 = max(x1, 0), max(y1, 0)
+        return x1, y1, x2 - x1, y2 - y1
+
+    def detect_and_align_face(self, img, detect_scale=1.0):
+        """Detect and align face from a BGR NumPy array (as cv2 decodes it).
+
+        With detect_scale < 1 detection runs on a downscaled copy, but the
+        face is cropped from the full-resolution image.
+        """
         try:
             if not isinstance(img, np.ndarray):
                 logger.error("Input must be a NumPy array")
                 return None, None
-            results = self.detector.detect_faces(img)
-            if not results:
+            # Don't shrink below 320px wide or small faces stop being found
+            detect_scale = max(detect_scale, min(1.0, 320 / img.shape[1]))
+            if detect_scale < 1.0:
+                small = cv2.resize(img, (0, 0), fx=detect_scale, fy=detect_scale, interpolation=cv2.INTER_AREA)
+                box = self._detect_face_box(small)
+            else:
+                box = self._detect_face_box(img)
+            if box is None:
                 logger.warning("No face detected")
                 return None, None
-            x, y, w, h = results[0]['box']
+            x, y, w, h = box
+            if detect_scale < 1.0:
+                x, y, w, h = (int(round(v / detect_scale)) for v in (x, y, w, h))
+                x, y = max(x, 0), max(y, 0)
             face = img[y:y+h, x:x+w]
             face = cv2.resize(face, (160, 160))
             return face, (x, y, w, h)
@@ -52,12 +276,23 @@ class FaceRecognizer:
         """Generate FaceNet embedding from a face image."""
         try:
             face = np.expand_dims(face, axis=0)
-            embedding = self.facenet.embeddings(face)[0]
+            with self._facenet_lock:
+                embedding = self.facenet.embeddings(face)[0]
             return embedding
         except Exception as e:
             logger.error(f"Embedding generation failed: {e}")
             return None
 
+    def generate_embeddings(self, faces):
+        """Generate FaceNet embeddings for a batch of faces in one forward pass."""
+        try:
+            batch = np.stack(faces)
+            with self._facenet_lock:
+                return self.facenet.embeddings(batch)
+        except Exception as e:
+            logger.error(f"Batch embedding generation failed: {e}")
+            return None
+
     def detect_blinks(self, frame, landmarks):
         """Detect blinks for liveness check."""
         try:
@@ -77,41 +312,204 @@ class FaceRecognizer:
     def load_encodings(self):
         """Load stored face encodings."""
         try:
-            for filename in os.listdir(self.voter_encodings_path):
-                if filename.endswith('.npy'):
-                    identifier = filename.split('.')[0]
-                    self.voter_encodings[identifier] = np.load(os.path.join(self.voter_encodings_path, filename))
+            with self._locked_bank_files():
+                encodings, stale = self._read_voter_encodings()
+                if stale:
+                    self._write_voter_bank(encodings)
+            with self._bank_lock:
+                self.voter_encodings = encodings
+                self._build_voter_matrix()
             logger.info(f"Loaded {len(self.voter_encodings)} voters encodings")
-            
+        except Exception as e:
+            logger.error(f"Error loading voter encodings: {e}")
+
+        try:
             for filename in os.listdir(self.admin_encodings_path):
                 if filename.endswith('.npy'):
                     identifier = filename.split('.')[0]
                     self.admin_encodings[identifier] = np.load(os.path.join(self.admin_encodings_path, filename))
             logger.info(f"Loaded {len(self.admin_encodings)} admins encodings")
         except Exception as e:
-            logger.error(f"Error loading encodings: {e}")
+            logger.error(f"Error loading admin encodings: {e}")
+
+    @contextmanager
+    def _locked_bank_files(self):
+        """Hold the voter bank files exclusively, across threads and processes."""
+        with self._bank_file_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.voter_encodings_path, VOTER_BANK_LOCK_FILE), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_voter_encodings(self):
+        """Read voter embeddings from disk.
+
+        Per-voter files are the source of truth: one wins over the bank when
+        the bank lacks that voter or the file is newer than the bank.
+        Returns the encodings and how many came from per-voter files.
+        """
+        encodings, bank_mtime = {}, 0.0
+        try:
+            encodings = self._load_voter_bank()
+            if encodings:
+                bank_mtime = os.path.getmtime(os.path.join(self.voter_encodings_path, VOTER_BANK_FILE))
+        except Exception as e:
+            logger.warning(f"Voter embedding bank unreadable, using per-voter files: {e}")
+            encodings = {}
+        stale = 0
+        for entry in os.scandir(self.voter_encodings_path):
+            if entry.name.endswith('.npy') and entry.name != VOTER_BANK_FILE:
+                identifier = entry.name.split('.')[0]
+                if identifier not in encodings or entry.stat().st_mtime > bank_mtime:
+                    encodings[identifier] = np.load(entry.path)
+                    stale += 1
+        return encodings, stale
+
+    def _load_voter_bank(self):
+        """Map voter ids to rows of the memory-mapped embedding bank."""
+        bank_path = os.path.join(self.voter_encodings_path, VOTER_BANK_FILE)
+        ids_path = os.path.join(self.voter_encodings_path, VOTER_IDS_FILE)
+        if not (os.path.exists(bank_path) and os.path.exists(ids_path)):
+            return {}
+        with open(ids_path) as f:
+            voter_ids = json.load(f)
+        bank = np.load(bank_path, mmap_mode='r')
+        if len(voter_ids) != len(bank):
+            logger.warning("Voter embedding bank and id list differ in length, rebuilding")
+            return {}
+        return dict(zip(voter_ids, bank))
+
+    def _save_voter_bank(self, updated):
+        """Merge updated voters into the bank on disk.
+
+        The bank is re-read under the file lock first, so voters registered
+        by other processes since this one loaded are kept.
+        """
+        with self._locked_bank_files():
+            encodings, _ = self._read_voter_encodings()
+            encodings.update(updated)
+            self._write_voter_bank(encodings)
+
+    def _write_voter_bank(self, encodings):
+        """Write voter embeddings to the bank, swapping each file in atomically."""
+        voter_ids = list(encodings.keys())
+        if not voter_ids:
+            return
+        bank = np.stack([encodings[v] for v in voter_ids]).astype(np.float16)
+        _atomic_write(os.path.join(self.voter_encodings_path, VOTER_BANK_FILE), 'wb', lambda f: np.save(f, bank))
+        _atomic_write(os.path.join(self.voter_encodings_path, VOTER_IDS_FILE), 'w', lambda f: json.dump(voter_ids, f))
+
+    def _build_voter_matrix(self):
+        """Stack voter encodings into one int8 matrix for vectorized search."""
+        self.voter_ids = list(self.voter_encodings.keys())
+        if self.voter_ids:
+            matrix = np.stack([self.voter_encodings[v] for v in self.voter_ids]).astype(np.float32)
+            self._voter_matrix, _ = quantize_embeddings(matrix)
+            self._voter_norms = np.linalg.norm(self._voter_matrix.astype(np.float32), axis=1)
+        else:
+            self._voter_matrix = np.empty((0, 0), dtype=np.int8)
+            self._voter_norms = np.empty(0, dtype=np.float32)
+
+    def _add_voter_to_matrix(self, matric, embedding):
+        """Add or replace one voter's row without rebuilding the whole matrix.
+
+        New arrays are swapped in rather than edited in place, so snapshots
+        already handed to searches stay unchanged. Call with _bank_lock held.
+        """
+        row, _ = quantize_embeddings(np.asarray(embedding, dtype=np.float32)[None, :])
+        norm = np.linalg.norm(row.astype(np.float32), axis=1)
+        if matric in self.voter_ids:
+            index = self.voter_ids.index(matric)
+            matrix, norms = self._voter_matrix.copy(), self._voter_norms.copy()
+            matrix[index] = row[0]
+            norms[index] = norm[0]
+            self._voter_matrix, self._voter_norms = matrix, norms
+        elif self.voter_ids:
+            self._voter_matrix = np.vstack([self._voter_matrix, row])
+            self._voter_norms = np.concatenate([self._voter_norms, norm])
+            self.voter_ids = self.voter_ids + [matric]
+        else:
+            self._voter_matrix = row
+            self._voter_norms = norm
+            self.voter_ids = [matric]
+
+    def voter_snapshot(self):
+        """Return a consistent (voter_ids, matrix, norms) view of the voter bank."""
+        with self._bank_lock:
+            return self.voter_ids, self._voter_matrix, self._voter_norms
+
+    def voter_distances(self, embedding, snapshot=None):
+        """Cosine distances from an embedding to each voter, ordered like the snapshot's ids."""
+        voter_ids, matrix, norms = snapshot or self.voter_snapshot()
+        if not voter_ids:
+            return np.empty(0, dtype=np.float32)
+        query, _ = quantize_embeddings(np.asarray(embedding, dtype=np.float32))
+        return cosine_distances(matrix, norms, query)
+
+    def voter_distances_batch(self, embeddings, snapshot=None):
+        """Cosine distances from each embedding (rows) to each voter (columns)."""
+        voter_ids, matrix, norms = snapshot or self.voter_snapshot()
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if not voter_ids:
+            return np.empty((len(embeddings), 0), dtype=np.float32)
+        queries, _ = quantize_embeddings(embeddings)
+        # A 512-term sum of int8 products stays below 2**24, so float32 BLAS
+        # is exact here and much faster than an int32 matmul
+        dots = queries.astype(np.float32) @ matrix.astype(np.float32).T
+        query_norms = np.linalg.norm(queries.astype(np.float32), axis=1)
+        return 1.0 - dots / np.outer(query_norms, norms)
 
     def verify_voter_face(self, img):
-        """Verify voter face from a NumPy array."""
+        """Verify voter face from a BGR NumPy array."""
         face, _ = self.detect_and_align_face(img)
         if face is None:
             return False, None
         embedding = self.generate_embedding(face)
         if embedding is None:
             return False, None
-        min_dist = float('inf')
-        identity = None
-        for voter_id, voter_embedding in self.voter_encodings.items():
-            dist = spatial.distance.cosine(embedding, voter_embedding)
-            if dist < min_dist and dist < 0.4:
-                min_dist = dist
-                identity = voter_id
-        if identity:
-            logger.info(f"Voter {identity} verified with distance {min_dist}")
-            return True, identity
+        snapshot = self.voter_snapshot()
+        distances = self.voter_distances(embedding, snapshot)
+        if len(distances):
+            best = int(np.argmin(distances))
+            min_dist = float(distances[best])
+            if min_dist < 0.4:
+                identity = snapshot[0][best]
+                logger.info(f"Voter {identity} verified with distance {min_dist}")
+                return True, identity
         logger.warning("No matching voter found")
         return False, None
 
+    def verify_voter_batch(self, imgs):
+        """Verify several voter images, embedding all detected faces at once.
+
+        Returns a list of (verified, identity) tuples in the order of imgs.
+        """
+        results = [(False, None)] * len(imgs)
+        faces, indices = [], []
+        for i, img in enumerate(imgs):
+            face, _ = self.detect_and_align_face(img)
+            if face is not None:
+                faces.append(face)
+                indices.append(i)
+        snapshot = self.voter_snapshot()
+        if not faces or not snapshot[0]:
+            return results
+        embeddings = self.generate_embeddings(faces)
+        if embeddings is None:
+            return results
+        distances = self.voter_distances_batch(embeddings, snapshot)
+        best = np.argmin(distances, axis=1)
+        for row, i in enumerate(indices):
+            min_dist = float(distances[row, best[row]])
+            if min_dist < 0.4:
+                results[i] = (True, snapshot[0][best[row]])
+        return results
+
     def verify_admin_face(self, img, user_id):
         """Verify admin face from a NumPy array."""
         face, _ = self.detect_and_align_face(img)
@@ -131,26 +529,91 @@ class FaceRecognizer:
         logger.warning(f"Admin {user_id} verification failed with distance {dist}")
         return False, None
 
-    def register_voter_face(self, img, matric):
-        """Register voter face from a NumPy array or file path."""
+    def register_voter_face(self, img, matric, detect_scale=1.0):
+        """Register voter face from a BGR NumPy array or file path.
+
+        Returns (success, aligned_face) so callers can reuse the detected face.
+        """
         try:
             if isinstance(img, str):
                 img_array = cv2.imread(img)
                 if img_array is None:
                     logger.error(f"Failed to read image {img}")
-                    return False
+                    return False, None
             else:
                 img_array = img
-            face, _ = self.detect_and_align_face(img_array)
+            face, _ = self.detect_and_align_face(img_array, detect_scale)
             if face is None:
-                return False
+                return False, None
             embedding = self.generate_embedding(face)
             if embedding is None:
-                return False
-            np.save(os.path.join(self.voter_encodings_path, f"{matric}.npy"), embedding)
-            self.voter_encodings[matric] = embedding
+                return False, face
+            with self._bank_lock:
+                _atomic_write(os.path.join(self.voter_encodings_path, f"{matric}.npy"), 'wb',
+                              lambda f: np.save(f, embedding))
+                self.voter_encodings[matric] = embedding
+                self._add_voter_to_matrix(matric, embedding)
+            self._save_voter_bank({matric: embedding})
             logger.info(f"Registered voter {matric} face")
-            return True
+            return True, face
         except Exception as e:
             logger.error(f"Error registering voter {matric}: {e}")
-            return False
+            return False, None
+
+    def register_voter_faces(self, images, detect_scale=1.0):
+        """Register many voters at once from a {matric: BGR array or path} mapping.
+
+        Images are decoded and their faces detected on a thread pool. OpenCV
+        releases the GIL and each thread has its own OpenCV detector, though
+        the MTCNN fallback runs one image at a time. Faces are then embedded
+        in FaceNet batches of EMBED_BATCH_SIZE and the voter bank is
+        rewritten once. Returns the registered matric numbers.
+        """
+        def load_and_align(item):
+            matric, img = item
+            img_array = cv2.imread(img) if isinstance(img, str) else img
+            if img_array is None:
+                logger.error(f"Failed to read image {img}")
+                return matric, None
+            face, _ = self.detect_and_align_face(img_array, detect_scale)
+            if face is None:
+                logger.warning(f"No face found for voter {matric}")
+            return matric, face
+
+        matrics, faces = [], []
+        with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+            for matric, face in pool.map(load_and_align, images.items()):
+                if face is not None:
+                    matrics.append(matric)
+                    faces.append(face)
+        if not faces:
+            return []
+        embeddings = []
+        for start in range(0, len(faces), EMBED_BATCH_SIZE):
+            batch = self.generate_embeddings(faces[start:start + EMBED_BATCH_SIZE])
+            if batch is None:
+                return []
+            embeddings.extend(batch)
+        with self._bank_lock:
+            for matric, embedding in zip(matrics, embeddings):
+                _atomic_write(os.path.join(self.voter_encodings_path, f"{matric}.npy"), 'wb',
+                              lambda f, e=embedding: np.save(f, e))
+                self.voter_encodings[matric] = embedding
+                self._add_voter_to_matrix(matric, embedding)
+        self._save_voter_bank(dict(zip(matrics, embeddings)))
+        logger.info(f"Registered {len(matrics)} voter faces")
+        return matrics
+
+
+_face_recognizer = None
+_face_recognizer_lock = threading.Lock()
+
+
+def get_face_recognizer():
+    """Return the shared FaceRecognizer, loading the models on first use."""
+    global _face_recognizer
+    if _face_recognizer is None:
+        with _face_recognizer_lock:
+            if _face_recognizer is None:
+                _face_recognizer = FaceRecognizer()
+    return _face_recognizer
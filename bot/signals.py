@@ -0,0 +1,10 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from .models import VerificationSession
+
+
+@receiver(post_delete, sender=VerificationSession)
+def forget_deleted_session(sender, instance, **kwargs):
+    """Stop the websocket consumer trusting a cached entry for a deleted session."""
+    cache.delete(VerificationSession.exists_cache_key(instance.id))
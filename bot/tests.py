@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+from django.utils import timezone
+
+from bot.management.commands.run_bot import Command
+from bot.models import Voter, Election, Candidate, Ballot, Vote
+
+
+class CreateVotesTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.voter = Voter.objects.create(matric_number='TEST/0001')
+        self.election = Election.objects.create(
+            title='Test Election',
+            start_time=now - timedelta(hours=1),
+            end_time=now + timedelta(hours=1),
+            status='active',
+        )
+        self.president = Candidate.objects.create(
+            election=self.election, name='Alice', position='President'
+        )
+        self.secretary = Candidate.objects.create(
+            election=self.election, name='Bob', position='Secretary'
+        )
+        self.command = Command()
+
+    def create_votes(self, candidate_ids):
+        return async_to_sync(self.command.create_votes_db)(
+            self.voter.matric_number, str(self.election.id), candidate_ids
+        )
+
+    def test_multi_position_ballot_is_recorded(self):
+        hashes = self.create_votes([str(self.president.id), str(self.secretary.id)])
+
+        self.assertEqual(len(hashes), 2)
+        self.assertEqual(Ballot.objects.filter(matric_number=self.voter, election=self.election).count(), 1)
+        self.assertEqual(
+            set(Vote.objects.filter(matric_number=self.voter).values_list('position', flat=True)),
+            {'President', 'Secretary'},
+        )
+
+    def test_second_ballot_is_rejected_as_a_whole(self):
+        self.create_votes([str(self.president.id)])
+        other = Candidate.objects.create(election=self.election, name='Carol', position='President')
+
+        hashes = self.create_votes([str(self.secretary.id), str(other.id)])
+
+        self.assertEqual(hashes, [])
+        self.assertEqual(Vote.objects.filter(matric_number=self.voter).count(), 1)
+
+    def test_second_ballot_for_other_positions_is_rejected(self):
+        # Two /vote flows racing past the has-voted check reach
+        # create_votes_db one after the other with disjoint positions
+        first = self.create_votes([str(self.president.id)])
+        second = self.create_votes([str(self.secretary.id)])
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, [])
+        self.assertEqual(
+            list(Vote.objects.filter(matric_number=self.voter).values_list('position', flat=True)),
+            ['President'],
+        )
@@ -38,7 +38,7 @@ def session_result(request, session_id):
         # Check if session is expired
         if session.is_expired() and session.status == 'pending':
             session.status = 'expired'
-            session.save()
+            session.save(update_fields=['status'])
         
         return JsonResponse({
             "status": session.status,
@@ -63,7 +63,7 @@ def update_session(request, session_id):
         
         session.status = 'completed'
         session.result = data
-        session.save()
+        session.save(update_fields=['status', 'result'])
         
         logger.info(f"Updated session {session_id} with result: {data}")
         return JsonResponse({"status": "success"})
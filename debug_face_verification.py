@@ -130,9 +130,9 @@ def test_live_verification():
                     embedding = face_recognizer.generate_embedding(face)
                     if embedding is not None:
                         print("   Distances to registered voters:")
-                        from scipy import spatial
-                        for voter_id, voter_embedding in face_recognizer.voter_encodings.items():
-                            dist = spatial.distance.cosine(embedding, voter_embedding)
+                        snapshot = face_recognizer.voter_snapshot()
+                        distances = face_recognizer.voter_distances(embedding, snapshot)
+                        for voter_id, dist in zip(snapshot[0], distances):
                             print(f"     • {voter_id}: {dist:.4f} {'✅' if dist < 0.4 else '❌'}")
                 
             except Exception as e:
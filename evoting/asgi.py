@@ -1,10 +1,15 @@
 import os
+import logging
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import verification.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'evoting.settings')
+# Workers sharing a GPU should each take memory as needed, not all of it
+os.environ.setdefault('TF_FORCE_GPU_ALLOW_GROWTH', 'true')
+
+from bot.services.face_recognition import get_face_recognizer
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
@@ -14,3 +19,10 @@ application = ProtocolTypeRouter({
         )
     ),
 })
+
+# Load the face models when the worker starts instead of on the first upload;
+# importing the views no longer does this
+try:
+    get_face_recognizer()
+except Exception as e:
+    logging.getLogger(__name__).error(f"Failed to initialize face recognizer: {e}")
@@ -1,3 +1,4 @@
+import logging
 import os
 from pathlib import Path
 
@@ -39,6 +40,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -73,6 +75,14 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Bot, web workers and scripts share this file; wait for the
+            # writer lock instead of failing with "database is locked".
+            'timeout': 20,
+        },
+        # Reuse connections across requests instead of reopening per request
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -105,6 +115,18 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 
+# Static files are served by WhiteNoise with hashed names and long cache
+# lifetimes; media uploads should be served by the front-end web server.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+WHITENOISE_MAX_AGE = 7 * 24 * 60 * 60
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -113,7 +135,7 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Telegram Bot settings
-TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN', default='7824676431:AAEo_evG5fAysSjrRdNH1DbHzoq7YJJsqss')
+TELEGRAM_BOT_TOKEN = config('TELEGRAM_BOT_TOKEN', default='')
 
 # Base URL for verification links
 BASE_URL = config('BASE_URL', default='http://localhost:8000')
@@ -139,12 +161,23 @@ LOGGING = {
         },
     },
     'handlers': {
-        'file': {
+        'file_raw': {
             'level': 'INFO',
             'class': 'logging.FileHandler',
             'filename': os.path.join(BASE_DIR, 'logs', 'django.log'),
             'formatter': 'verbose',
         },
+        # Every app logger shares this one buffered handler, so the log file is
+        # opened once and records are written in small batches (or at once
+        # for warnings and errors). Keep the batch small: a quiet server holds
+        # INFO lines back until it fills.
+        'file': {
+            'level': 'INFO',
+            'class': 'logging.handlers.MemoryHandler',
+            'capacity': 16,
+            'flushLevel': logging.WARNING,
+            'target': 'file_raw',
+        },
         'console': {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
@@ -170,9 +203,30 @@ LOGGING = {
     },
 }
 
-# Channels configuration
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
+# Channels and cache configuration
+# Use Redis when REDIS_URL is set so several ASGI workers can share websocket
+# groups and cached data; the in-memory backends only work within a single
+# process.
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL],
+            },
+        },
+    }
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
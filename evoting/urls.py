@@ -9,6 +9,6 @@ urlpatterns = [
     path('verification/', include('verification.urls')),
 ]
 
-# Serve media files in development
+# Serve media files in development; in production the web server handles /media/
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
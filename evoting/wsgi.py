@@ -1,6 +1,18 @@
 import os
+import logging
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'evoting.settings')
+# Workers sharing a GPU should each take memory as needed, not all of it
+os.environ.setdefault('TF_FORCE_GPU_ALLOW_GROWTH', 'true')
+
+from bot.services.face_recognition import get_face_recognizer
 
 application = get_wsgi_application()
+
+# Load the face models when the worker starts instead of on the first upload;
+# importing the views no longer does this
+try:
+    get_face_recognizer()
+except Exception as e:
+    logging.getLogger(__name__).error(f"Failed to initialize face recognizer: {e}")
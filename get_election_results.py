@@ -36,7 +36,7 @@ def get_election_results(election_id=None):
         # Get all positions in this election
         positions = election.candidates.values_list('position', flat=True).distinct()
         
-        total_voters = 0
+        total_voters = Vote.objects.filter(election=election).values('matric_number').distinct().count()
         
         for position in positions:
             print(f"\n📍 {position}")
@@ -48,7 +48,6 @@ def get_election_results(election_id=None):
             ).order_by('-vote_count')
             
             position_total_votes = sum(c.vote_count for c in candidates)
-            total_voters = max(total_voters, position_total_votes)
             
             if candidates:
                 for i, candidate in enumerate(candidates, 1):
@@ -73,10 +72,10 @@ def get_detailed_vote_breakdown(election_id):
         votes = Vote.objects.filter(election=election).select_related('candidate', 'matric_number')
         
         print(f"Individual votes ({votes.count()} total):")
-        for vote in votes:
+        for vote in votes.iterator(chunk_size=1000):
             print(f"  • {vote.matric_number.matric_number} → {vote.candidate.name} ({vote.candidate.position})")
             print(f"    Time: {vote.timestamp}")
-            print(f"    Hash: {vote.vote_hash[:16]}...")
+            print(f"    Hash: {bytes(vote.vote_hash).hex()[:16]}...")
             print()
         
     except Election.DoesNotExist:
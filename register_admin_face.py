@@ -14,7 +14,11 @@ django.setup()
 
 from django.conf import settings
 from bot.models import Admin
-from bot.services.face_recognition import FaceRecognizer
+from bot.services.face_recognition import get_face_recognizer
+
+# Run face detection on a quarter-size copy of the image; the face itself is
+# still cropped from the full-resolution image
+DETECT_SCALE = 0.25
 
 def capture_face_from_webcam():
     """Capture face from webcam"""
@@ -25,6 +29,10 @@ def capture_face_from_webcam():
     if not cap.isOpened():
         print("❌ Cannot access webcam")
         return None
+    # Keep only the newest frame queued so SPACE grabs what the preview shows
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
     
     captured_image = None
     
@@ -39,7 +47,7 @@ def capture_face_from_webcam():
         
         key = cv2.waitKey(1) & 0xFF
         if key == ord(' '):  # Space key
-            captured_image = frame.copy()
+            captured_image = frame
             print("✅ Image captured!")
             break
         elif key == 27:  # ESC key
@@ -113,7 +121,7 @@ def main():
     # Initialize face recognizer
     try:
         print("🔍 Initializing face recognizer...")
-        face_recognizer = FaceRecognizer()
+        face_recognizer = get_face_recognizer()
         print("✅ Face recognizer initialized")
     except Exception as e:
         print(f"❌ Failed to initialize face recognizer: {e}")
@@ -124,7 +132,7 @@ def main():
         print("🔍 Processing face...")
         
         # Detect face
-        face, bbox = face_recognizer.detect_and_align_face(image)
+        face, bbox = face_recognizer.detect_and_align_face(image, DETECT_SCALE)
         if face is None:
             print("❌ No face detected in image")
             return
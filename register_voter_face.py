@@ -14,7 +14,11 @@ django.setup()
 
 from django.conf import settings
 from bot.models import Voter
-from bot.services.face_recognition import FaceRecognizer
+from bot.services.face_recognition import get_face_recognizer
+
+# Run face detection on a quarter-size copy of the image; the face itself is
+# still cropped from the full-resolution image
+DETECT_SCALE = 0.25
 
 def capture_face_from_webcam():
     """Capture face from webcam"""
@@ -25,6 +29,10 @@ def capture_face_from_webcam():
     if not cap.isOpened():
         print("❌ Cannot access webcam")
         return None
+    # Keep only the newest frame queued so SPACE grabs what the preview shows
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
     
     captured_image = None
     
@@ -39,7 +47,7 @@ def capture_face_from_webcam():
         
         key = cv2.waitKey(1) & 0xFF
         if key == ord(' '):  # Space key
-            captured_image = frame.copy()
+            captured_image = frame
             print("✅ Image captured!")
             break
         elif key == 27:  # ESC key
@@ -64,6 +72,28 @@ def load_face_from_file(image_path):
     print(f"✅ Image loaded from: {image_path}")
     return image
 
+def register_directory(directory):
+    """Register every <matric>.jpg/.png in a directory in one batch"""
+    image_paths = {
+        os.path.splitext(name)[0]: os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.lower().endswith(('.jpg', '.jpeg', '.png'))
+    }
+    known = set(Voter.objects.filter(matric_number__in=image_paths).values_list('matric_number', flat=True))
+    for matric in sorted(set(image_paths) - known):
+        print(f"⚠️ Skipping {matric}: voter not found in database")
+    image_paths = {m: p for m, p in image_paths.items() if m in known}
+    if not image_paths:
+        print("❌ No images of registered voters found")
+        return
+    
+    print(f"🔍 Processing {len(image_paths)} images...")
+    face_recognizer = get_face_recognizer()
+    registered = face_recognizer.register_voter_faces(image_paths, DETECT_SCALE)
+    for matric in sorted(set(image_paths) - set(registered)):
+        print(f"❌ {matric}: no face detected")
+    print(f"\n🎉 Registered {len(registered)} of {len(image_paths)} voters")
+
 def main():
     print("🗳️ Voter Face Registration")
     print("=" * 30)
@@ -113,7 +143,7 @@ def main():
     # Initialize face recognizer
     try:
         print("🔍 Initializing face recognizer...")
-        face_recognizer = FaceRecognizer()
+        face_recognizer = get_face_recognizer()
         print("✅ Face recognizer initialized")
     except Exception as e:
         print(f"❌ Failed to initialize face recognizer: {e}")
@@ -124,7 +154,7 @@ def main():
         print("🔍 Processing face...")
         
         # Use the register_voter_face method
-        success = face_recognizer.register_voter_face(image, matric_number)
+        success, face = face_recognizer.register_voter_face(image, matric_number, DETECT_SCALE)
         
         if success:
             print(f"✅ Voter {matric_number} face registered successfully!")
@@ -133,11 +163,9 @@ def main():
             voter_encodings_path = os.path.join(settings.FACE_DATA_PATH, 'voters')
             face_image_path = os.path.join(voter_encodings_path, f"{matric_number}_face.jpg")
             
-            # Extract and save the detected face
-            face, _ = face_recognizer.detect_and_align_face(image)
-            if face is not None:
-                cv2.imwrite(face_image_path, face)
-                print(f"✅ Face image saved to: {face_image_path}")
+            # Save the face detected during registration
+            cv2.imwrite(face_image_path, face)
+            print(f"✅ Face image saved to: {face_image_path}")
             
             print("\n🎉 Registration complete!")
             print("The voter can now use face verification in the Telegram bot.")
@@ -150,4 +178,7 @@ def main():
         traceback.print_exc()
 
 if __name__ == '__main__':
-    main()
+    if len(sys.argv) == 3 and sys.argv[1] == '--dir':
+        register_directory(sys.argv[2])
+    else:
+        main()
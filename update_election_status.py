@@ -10,38 +10,32 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'evoting.settings')
 django.setup()
 
+from django.db import transaction
+from django.db.models import Count
 from django.utils import timezone
 from bot.models import Election
 
-def update_election_statuses():
+def update_election_statuses(verbose=False):
     """Update election statuses based on current time"""
     print("🕒 Updating Election Statuses")
     print("=" * 30)
     
     now = timezone.now()
-    elections = Election.objects.all()
+    # One UPDATE per target status instead of a save() per changed election
+    transitions = {
+        'ended': Election.objects.filter(end_time__lt=now).exclude(status='ended'),
+        'active': Election.objects.filter(start_time__lte=now, end_time__gte=now).exclude(status='active'),
+        'pending': Election.objects.filter(start_time__gt=now).exclude(status='pending'),
+    }
     
     updated_count = 0
     
-    for election in elections:
-        old_status = election.status
-        
-        # Determine new status based on time
-        if now < election.start_time:
-            new_status = 'pending'
-        elif election.start_time <= now <= election.end_time:
-            new_status = 'active'
-        else:
-            new_status = 'ended'
-        
-        # Update if status changed
-        if old_status != new_status:
-            election.status = new_status
-            election.save()
-            updated_count += 1
-            print(f"✅ {election.title}: {old_status} → {new_status}")
-        else:
-            print(f"ℹ️ {election.title}: {old_status} (no change)")
+    with transaction.atomic():
+        for new_status, elections in transitions.items():
+            if verbose:
+                for title, old_status in elections.values_list('title', 'status'):
+                    print(f"✅ {title}: {old_status} → {new_status}")
+            updated_count += elections.update(status=new_status)
     
     print(f"\n📊 Summary: {updated_count} elections updated")
     return updated_count
@@ -51,7 +45,8 @@ def show_election_summary():
     print("\n📋 Election Summary")
     print("=" * 30)
     
-    elections = Election.objects.all()
+    # Count votes in the same query rather than one COUNT per election
+    elections = Election.objects.annotate(total_votes=Count('vote'))
     now = timezone.now()
     
     for election in elections:
@@ -73,9 +68,8 @@ def show_election_summary():
             print(f"   ⏰ Ended: {time_since_end} ago")
         
         # Show vote count
-        total_votes = election.vote_set.count()
-        print(f"   📊 Total votes: {total_votes}")
+        print(f"   📊 Total votes: {election.total_votes}")
 
 if __name__ == '__main__':
-    update_election_statuses()
+    update_election_statuses(verbose='--verbose' in sys.argv)
     show_election_summary()
@@ -2,10 +2,14 @@ import json
 import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.core.cache import cache
 from bot.models import VerificationSession
 
 logger = logging.getLogger(__name__)
 
+# Sessions live for 10 minutes, so a cached "exists" never needs to outlive that
+SESSION_EXISTS_TTL = 600
+
 class VerificationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.session_id = self.scope['url_route']['kwargs']['session_id']
@@ -19,8 +23,13 @@ class VerificationConsumer(AsyncWebsocketConsumer):
         
         await self.accept()
         
-        # Check if session exists
-        session_exists = await self.check_session_exists()
+        # Check if session exists; reconnects are answered from the cache
+        cache_key = VerificationSession.exists_cache_key(self.session_id)
+        session_exists = await cache.aget(cache_key)
+        if session_exists is None:
+            session_exists = await self.check_session_exists()
+            if session_exists:
+                await cache.aset(cache_key, True, SESSION_EXISTS_TTL)
         if not session_exists:
             await self.send(text_data=json.dumps({
                 'type': 'error',
@@ -36,26 +45,9 @@ class VerificationConsumer(AsyncWebsocketConsumer):
         )
     
     async def receive(self, text_data):
-        try:
-            data = json.loads(text_data)
-            message_type = data.get('type')
-            
-            if message_type == 'status_update':
-                # Update session status
-                await self.channel_layer.group_send(
-                    self.group_name,
-                    {
-                        'type': 'status_update',
-                        'status': data.get('status'),
-                        'message': data.get('message')
-                    }
-                )
-        except Exception as e:
-            logger.error(f"Error in websocket receive: {e}")
-            await self.send(text_data=json.dumps({
-                'type': 'error',
-                'message': str(e)
-            }))
+        # Status updates come only from the server; relaying client frames
+        # would let any page that knows the session id fake a result
+        logger.debug(f"Ignoring client frame on session {self.session_id}")
     
     async def status_update(self, event):
         # Send status update to WebSocket
@@ -1,28 +1,42 @@
+import asyncio
 import json
 import logging
+import os
+import threading
 import numpy as np
 import cv2
 import base64
+from concurrent.futures import ThreadPoolExecutor
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.http import HttpResponseNotAllowed, JsonResponse
 from django.conf import settings
 from django.utils import timezone
-from asgiref.sync import async_to_sync
+from asgiref.sync import sync_to_async
 from channels.layers import get_channel_layer
 from bot.models import VerificationSession, Voter, Admin
-from bot.services.face_recognition import FaceRecognizer
+from bot.services.face_recognition import get_face_recognizer
 
 logger = logging.getLogger(__name__)
 
-# Initialize face recognizer globally
-try:
-    face_recognizer = FaceRecognizer()
-    logger.info("Face recognizer initialized in views")
-except Exception as e:
-    logger.error(f"Failed to initialize face recognizer in views: {e}")
-    face_recognizer = None
+# Longest side uploads are shrunk to before face processing; detection cost
+# grows with pixel count and the face is resized to 160x160 anyway
+MAX_IMAGE_SIDE = 640
+
+# Webcam frames carry no meaningful EXIF orientation, so don't parse it
+DECODE_FLAGS = cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+DECODE_FLAGS_HALF = cv2.IMREAD_REDUCED_COLOR_2 | cv2.IMREAD_IGNORE_ORIENTATION
+
+# Cheap checks that turn away blurred or faceless frames before the CNN
+# detector and FaceNet run; the cascade ships with opencv-python
+MIN_SHARPNESS = 50.0
+FACE_CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+# CascadeClassifier isn't safe to share between threads, so each CV_POOL
+# thread loads its own
+_thread_local = threading.local()
+
+# Image decoding and face work run here, off the event loop; OpenCV and
+# TensorFlow release the GIL, so requests overlap on the CPU
+CV_POOL = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix='face')
 
 def capture_face(request, session_id):
     """
@@ -32,8 +46,7 @@ def capture_face(request, session_id):
     
     # Check if session is expired
     if session.is_expired():
-        session.status = 'expired'
-        session.save()
+        VerificationSession.objects.filter(id=session_id).update(status='expired')
         return render(request, 'verification/expired.html')
     
     context = {
@@ -44,38 +57,92 @@ def capture_face(request, session_id):
     
     return render(request, 'verification/capture.html', context)
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def process_image(request, session_id):
+def decode_image(image_bytes, capture_width):
+    """Decode an uploaded JPEG, shrunk to at most MAX_IMAGE_SIDE; None if invalid."""
+    # frombuffer wraps the bytes without copying them
+    np_arr = np.frombuffer(image_bytes, np.uint8)
+    # Captures at least twice MAX_IMAGE_SIDE wide are decoded at half
+    # size directly, which lets libjpeg skip most of the IDCT work
+    if capture_width >= 2 * MAX_IMAGE_SIDE:
+        img = cv2.imdecode(np_arr, DECODE_FLAGS_HALF)
+    else:
+        img = cv2.imdecode(np_arr, DECODE_FLAGS)
+    if img is None:
+        return None
+    
+    scale = MAX_IMAGE_SIDE / max(img.shape[:2])
+    if scale < 1.0:
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return img
+
+def face_cascade():
+    """Return this thread's Haar face cascade, loading it on first use."""
+    cascade = getattr(_thread_local, 'face_cascade', None)
+    if cascade is None:
+        cascade = _thread_local.face_cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
+    return cascade
+
+def reject_reason(img):
+    """Return why a frame is unusable (blurred or faceless), or None."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if cv2.Laplacian(gray, cv2.CV_64F).var() < MIN_SHARPNESS:
+        return 'Image too blurry, please retake'
+    cascade = face_cascade()
+    if not cascade.empty() and len(cascade.detectMultiScale(gray, 1.2, 3)) == 0:
+        return 'No face found, please retake'
+    return None
+
+# Async so a worker keeps serving other requests while faces are processed.
+# Django 4.2's csrf_exempt and require_http_methods only wrap sync views, so
+# both are applied by hand.
+async def process_image(request, session_id):
     """
     Process a captured face image for verification or registration
     """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    
+    loop = asyncio.get_running_loop()
     try:
-        session = get_object_or_404(VerificationSession, id=session_id)
+        session = await sync_to_async(get_object_or_404)(VerificationSession, id=session_id)
         
         # Check if session is expired
         if session.is_expired():
-            session.status = 'expired'
-            session.save()
+            await VerificationSession.objects.filter(id=session_id).aupdate(status='expired')
             return JsonResponse({'status': 'error', 'message': 'Session expired'}, status=400)
         
-        # Get image data from request
-        data = json.loads(request.body)
-        image_data = data.get('image')
-        matric = data.get('matric')
+        if session.status != 'pending':
+            return JsonResponse({'status': 'error', 'message': 'Session already completed'}, status=409)
+        
+        # Get image data from request: the capture page posts the raw JPEG
+        # with the matric number in a header; JSON with a base64 image is
+        # still accepted from older clients
+        if request.content_type == 'image/jpeg':
+            image_bytes = request.body
+            image_data = None
+            matric = request.headers.get('X-Matric')
+        else:
+            data = json.loads(request.body)
+            image_data = data.get('image')
+            matric = data.get('matric')
+            image_bytes = None
+            if image_data:
+                # Remove data URL prefix if present; partition() doesn't build
+                # a list of every comma-separated piece of the payload
+                image_data = image_data.partition(',')[2] or image_data
         
-        if not image_data:
+        if not (image_bytes or image_data):
             return JsonResponse({'status': 'error', 'message': 'No image data provided'}, status=400)
         
-        # Convert base64 to image
+        # Decode the image
         try:
-            # Remove data URL prefix if present
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
-            
-            image_bytes = base64.b64decode(image_data)
-            np_arr = np.frombuffer(image_bytes, np.uint8)
-            img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+            if image_bytes is None:
+                image_bytes = base64.b64decode(image_data)
+            try:
+                capture_width = int(request.headers.get('X-Capture-Width', 0))
+            except ValueError:
+                capture_width = 0
+            img = await loop.run_in_executor(CV_POOL, decode_image, image_bytes, capture_width)
             
             if img is None:
                 return JsonResponse({'status': 'error', 'message': 'Invalid image data'}, status=400)
@@ -86,28 +153,35 @@ def process_image(request, session_id):
             logger.error(f"Error decoding image: {e}")
             return JsonResponse({'status': 'error', 'message': f'Error decoding image: {str(e)}'}, status=400)
         
-        # Check if face recognizer is available
-        if not face_recognizer:
-            logger.error("Face recognizer not available")
+        # Reject unusable frames early; the session stays pending for a retake
+        reason = await loop.run_in_executor(CV_POOL, reject_reason, img)
+        if reason:
+            return JsonResponse({'status': 'error', 'message': reason}, status=400)
+        
+        # Check if face recognizer is available (loaded on first use, or at
+        # worker startup by the ASGI/WSGI entry points)
+        try:
+            face_recognizer = await loop.run_in_executor(CV_POOL, get_face_recognizer)
+        except Exception as e:
+            logger.error(f"Face recognizer not available: {e}")
             return JsonResponse({'status': 'error', 'message': 'Face recognition system not available'}, status=500)
         
         # Process based on session type
         try:
             if session.session_type == 'admin':
                 logger.info(f"Processing admin verification for user {session.user_id}")
-                verified, identity = face_recognizer.verify_admin_face(img, session.user_id)
+                verified, identity = await loop.run_in_executor(
+                    CV_POOL, face_recognizer.verify_admin_face, img, session.user_id
+                )
                 result = {'verified': verified, 'matric': None}
                 logger.info(f"Admin verification result: {verified}")
                 
             elif session.session_type == 'vote':
                 logger.info("Processing voter verification")
                 
-                # Debug: Check loaded encodings
-                logger.info(f"Loaded voter encodings: {len(face_recognizer.voter_encodings)}")
-                for voter_id in face_recognizer.voter_encodings.keys():
-                    logger.info(f"  - {voter_id}")
+                logger.debug(f"Searching {len(face_recognizer.voter_ids)} voter encodings")
                 
-                verified, identity = face_recognizer.verify_voter_face(img)
+                verified, identity = await loop.run_in_executor(CV_POOL, face_recognizer.verify_voter_face, img)
                 result = {'verified': verified, 'matric': identity}
                 logger.info(f"Voter verification result: verified={verified}, identity={identity}")
                 
@@ -118,35 +192,38 @@ def process_image(request, session_id):
                 logger.info(f"Processing voter registration for {matric}")
                 
                 # Check if voter exists in database
-                if not Voter.objects.filter(matric_number=matric).exists():
+                if not await Voter.objects.filter(matric_number=matric).aexists():
                     return JsonResponse({'status': 'error', 'message': 'Voter not found in database'}, status=400)
                 
-                verified = face_recognizer.register_voter_face(img, matric)
+                verified, _ = await loop.run_in_executor(CV_POOL, face_recognizer.register_voter_face, img, matric)
                 result = {'verified': verified, 'matric': matric}
                 logger.info(f"Voter registration result: {verified}")
             
         except Exception as e:
-            logger.error(f"Error in face processing: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error in face processing: {e}")
             return JsonResponse({'status': 'error', 'message': f'Face processing error: {str(e)}'}, status=500)
         
-        # Update session
-        session.status = 'completed'
-        session.result = result
-        session.save()
+        # Complete the session with a single conditional UPDATE; if another
+        # request completed it first, keep that result
+        updated = await VerificationSession.objects.filter(id=session_id, status='pending').aupdate(
+            status='completed',
+            result=result
+        )
+        if not updated:
+            return JsonResponse({'status': 'error', 'message': 'Session already completed'}, status=409)
         
         logger.info(f"Session {session_id} completed with result: {result}")
         
         # Notify via WebSocket
         try:
             channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
+            await channel_layer.group_send(
                 f'verification_{session_id}',
                 {
                     'type': 'status_update',
                     'status': 'completed',
-                    'message': 'Verification completed'
+                    'message': 'Verification completed',
+                    'session_id': str(session_id),
                 }
             )
         except Exception as e:
@@ -158,12 +235,12 @@ def process_image(request, session_id):
             'message': 'Verification successful' if result['verified'] else 'Verification failed',
             'debug_info': {
                 'session_type': session.session_type,
-                'loaded_encodings': len(face_recognizer.voter_encodings) if face_recognizer else 0
+                'loaded_encodings': len(face_recognizer.voter_ids)
             }
         })
         
     except Exception as e:
-        logger.error(f"Error processing image: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error processing image: {e}")
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+process_image.csrf_exempt = True